@@ -1,33 +1,109 @@
-from flask import Flask
+import os
+import threading
+import time
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from routes.dashboard import dashboard_bp
 from routes.trends import trends_bp
 from routes.patterns import patterns_bp
 from routes.topics import topics_bp
-from utils.data_loader import DataStore
+from utils import metrics
+from utils.analytics import build_indexes
+from utils.cache import RESULT_CACHE
+from utils.data_loader import DataStore, Snapshot
+from utils.offload import Overloaded
+from utils.response_cache import RESPONSE_CACHE
+from utils.serialization import json_response
+from utils.shared_snapshot import SharedSnapshotStore
+
+# Requests replayed against every new snapshot before it serves traffic
+DEFAULT_WARMUP_URLS = [
+    '/api/dashboard/summary',
+    '/api/trends/overview?days=90',
+    '/api/patterns/top?limit=50',
+]
+# WSGI environ key that makes a request read a given snapshot instead of the published one
+SNAPSHOT_ENVIRON_KEY = 'trendminer.snapshot'
 
 def create_app():
     app = Flask(__name__)
     CORS(app)
+    app.config.setdefault('WARMUP_URLS', DEFAULT_WARMUP_URLS)
+    # How often the CSV is checked for changes; appended rows are merged in incrementally
+    app.config.setdefault('REFRESH_MINUTES', 5)
+    # Dataset served by the single-process app (benchmarks point it at synthetic data)
+    app.config.setdefault('DATA_CSV', os.environ.get('TRENDMINER_CSV', 'data/mock_social_trends_5000.csv'))
+    # Set in multi-process deployments: workers map the snapshots loader.py publishes there
+    app.config.setdefault('SHARED_SNAPSHOT_DIR', os.environ.get('TRENDMINER_SHARED_SNAPSHOTS'))
+    # Request/stage timing with Server-Timing headers, and ?profile=1; both off by default
+    app.config.setdefault('METRICS', os.environ.get('TRENDMINER_METRICS') == '1')
+    app.config.setdefault('PROFILING', os.environ.get('TRENDMINER_PROFILING') == '1')
+    metrics.enable(app.config['METRICS'])
 
     # Load data using the DataStore class
     try:
-        app.config['DATASTORE'] = DataStore(csv_path='data/mock_social_trends_5000.csv')
+        if app.config['SHARED_SNAPSHOT_DIR']:
+            app.config['DATASTORE'] = SharedSnapshotStore(app.config['SHARED_SNAPSHOT_DIR'])
+        else:
+            app.config['DATASTORE'] = DataStore(csv_path=app.config['DATA_CSV'],
+                                                 refresh_minutes=app.config['REFRESH_MINUTES'])
     except FileNotFoundError as e:
         print(f"Error: {e}. Make sure the CSV file is in the 'data' directory.")
         # Depending on the desired behavior, you might want to exit or handle this differently.
         # For now, we'll continue with an empty DataFrame to allow the app to start.
         import pandas as pd
-        from collections import defaultdict
         
         class EmptyDataStore:
             def __init__(self):
-                self.df = pd.DataFrame()
-                self.topics = {}
-                self.topic_mentions = defaultdict(list)
+                self.snapshot = Snapshot(pd.DataFrame())
+                self.df = self.snapshot.df
+                self.topics = self.snapshot.topics
+
+            def on_build(self, callback):
+                pass
+
+            def on_publish(self, callback):
+                pass
 
         app.config['DATASTORE'] = EmptyDataStore()
 
+    @app.before_request
+    def pin_snapshot():
+        """Pins the current snapshot for the lifetime of the request."""
+        # Refresh may publish a new snapshot mid-request; handlers only read g.snapshot
+        g.snapshot = request.environ.get(SNAPSHOT_ENVIRON_KEY) or app.config['DATASTORE'].snapshot
+
+
+    if app.config['METRICS']:
+        @app.before_request
+        def start_timing():
+            g.request_started = time.perf_counter()
+            metrics.begin_request()
+
+        @app.after_request
+        def record_timing(response):
+            started = g.pop('request_started', None)
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+                response.headers['Server-Timing'] = metrics.end_request(route, time.perf_counter() - started)
+            return response
+
+    if app.config['PROFILING']:
+        @app.before_request
+        def start_profile():
+            if request.args.get('profile') == '1':
+                g.profile = metrics.RequestProfile()
+                g.profile.start()
+
+        @app.after_request
+        def send_profile(response):
+            profile = g.pop('profile', None)
+            if profile is None:
+                return response
+            report = profile.stop()
+            # Keeps the status, so a profiled failure still reads as one to clients and logs
+            return Response(f"{request.method} {request.full_path} -> {response.status}\n\n{report}",
+                            status=response.status_code, mimetype='text/plain')
 
     # register blueprints
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
@@ -35,11 +111,61 @@ def create_app():
     app.register_blueprint(patterns_bp, url_prefix='/api/patterns')
     app.register_blueprint(topics_bp, url_prefix='/api/topics')
 
+    @app.route('/metrics')
+    def metrics_view():
+        """Latency histograms per route and stage, cache hit rates and snapshot build durations."""
+        snapshot = app.config['DATASTORE'].snapshot
+        return json_response({
+            'enabled': metrics.enabled(),
+            'routes': metrics.ROUTES.stats(),
+            'stages': metrics.STAGES.stats(),
+            'caches': {'results': RESULT_CACHE.stats(), 'responses': RESPONSE_CACHE.stats()},
+            'snapshot_builds': metrics.build_stats(),
+            'snapshot': {'version': snapshot.version, 'rows': len(snapshot.df)},
+        })
+
+    @app.errorhandler(Overloaded)
+    def overloaded(e):
+        """Heavy analytics are at their concurrency limit; ask the client to come back shortly."""
+        return {'error': str(e)}, 503, {'Retry-After': str(e.retry_after)}
+
+    ready = threading.Event()
+
+    def warm_up(snapshot):
+        """Replays the warm-up requests against a snapshot so their results are cached."""
+        started = time.perf_counter()
+        # Indexes first: built inside an offloaded request they can outlast its timeout
+        try:
+            build_indexes(snapshot)
+        except Exception as e:
+            print(f"Building indexes for warm-up failed: {e}")
+        client = app.test_client()
+        for url in app.config['WARMUP_URLS']:
+            try:
+                response = client.get(url, environ_overrides={SNAPSHOT_ENVIRON_KEY: snapshot})
+                if response.status_code != 200:
+                    print(f"Warm-up request {url} returned {response.status_code}")
+            except Exception as e:
+                print(f"Warm-up request {url} failed: {e}")
+        metrics.record_build('warm_up', time.perf_counter() - started, len(snapshot.df))
+        print(f"Warmed snapshot {snapshot.version} in {time.perf_counter() - started:.2f}s")
+
+    def warm_up_initial():
+        warm_up(app.config['DATASTORE'].snapshot)
+        ready.set()
+
     @app.route('/health')
     def health():
-        """Health check endpoint."""
+        """Health check endpoint; reports unready until the first warm-up finishes."""
+        if not ready.is_set():
+            return {'status': 'warming'}, 503
         return {'status': 'ok'}
 
+    # Refreshed snapshots are warmed before they're published; the first one
+    # is already live, so warm it in the background and report unready meanwhile
+    app.config['DATASTORE'].on_build(warm_up)
+    threading.Thread(target=warm_up_initial, daemon=True).start()
+
     return app
 
 app = create_app()
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""Benchmarks every API route and analytics function on a synthetic dataset.
+
+    python bench/benchmark.py [--rows 10k | --csv PATH] [--iterations 20] [--only pattern]
+                              [--save bench/baselines/10k.json] [--compare bench/baselines/10k.json]
+
+Routes are driven through the Flask test client twice: 'cold' with the
+result and response caches cleared before every request (snapshot indexes
+are kept, as in production), and 'cached' as repeat requests are served.
+Analytics functions are called directly with the caches cleared. Each
+benchmark reports latency percentiles, throughput and the peak memory of
+one extra run traced with tracemalloc. --save writes the results as a JSON
+baseline; --compare exits with status 1 when any benchmark's median got
+slower than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from generate import parse_rows, size_label, write_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every /api route, with the parameters the dashboard uses
+ROUTES = [
+    '/api/dashboard/summary',
+    '/api/dashboard/for-you?interests=ai,ev,coding&limit=20',
+    '/api/dashboard/stats',
+    '/api/trends/overview?days=90',
+    '/api/trends/platform-comparison?topic={topic}',
+    '/api/patterns/top?limit=50',
+    '/api/patterns/rules',
+    '/api/patterns/graph',
+    '/api/patterns/graph?node={topic}',
+    '/api/topics/list?query=ai',
+    '/api/topics/detail?topic={topic}',
+]
+INTERESTS = 'ai,ev,coding'
+# Runs every benchmark gets, however slow; after that it stops at --max-seconds
+MIN_ITERATIONS = 3
+
+
+def analytics_benchmarks(analytics, snapshot, topic):
+    """(name, call) pairs for the analytics functions, called on the snapshot."""
+    def raw(func):
+        # Skip the result cache and the offload pool; the caller clears caches
+        # used further down, such as score_posts under the feed functions
+        return getattr(func, 'uncached', func)
+
+    return [
+        ('tracked_trends_count', lambda: raw(analytics.tracked_trends_count)(snapshot)),
+        ('active_topics_count', lambda: raw(analytics.active_topics_count)(snapshot)),
+        ('updated_recently_count', lambda: raw(analytics.updated_recently_count)(snapshot)),
+        ('platform_breakdown', lambda: raw(analytics.platform_breakdown)(snapshot)),
+        ('score_posts', lambda: raw(analytics.score_posts)(snapshot, INTERESTS)),
+        ('compute_relevance_score', lambda: analytics.compute_relevance_score(snapshot, INTERESTS)),
+        ('trending_posts', lambda: analytics.trending_posts(snapshot, INTERESTS)),
+        ('analyze_trends', lambda: raw(analytics.analyze_trends)(snapshot)),
+        ('platform_comparison', lambda: raw(analytics.platform_comparison)(snapshot, topic)),
+        ('pattern_rules', lambda: raw(analytics.pattern_rules)(snapshot)),
+        ('association_rules', lambda: raw(analytics.association_rules)(snapshot)),
+        ('graph_view', lambda: raw(analytics.graph_view)(snapshot)),
+        ('topic_time_series', lambda: raw(analytics.topic_time_series)(snapshot, topic)),
+        ('build_phrase_index', lambda: analytics.build_phrase_index(snapshot)),
+        ('build_hashtag_index', lambda: analytics.build_hashtag_index(snapshot)),
+        ('build_cooccurrence_graph', lambda: analytics.build_cooccurrence_graph(snapshot)),
+    ]
+
+
+def measure(call, iterations, max_seconds, before=None):
+    """Times call() up to iterations times, then traces one more run for its peak memory."""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        if before is not None:
+            before()
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+        if i + 1 >= MIN_ITERATIONS and time.perf_counter() - started > max_seconds:
+            break
+
+    if before is not None:
+        before()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ms = np.array(latencies) * 1000
+    return {
+        'runs': len(latencies),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+        'min_ms': round(float(ms.min()), 3),
+        'max_ms': round(float(ms.max()), 3),
+        'ops_per_s': round(len(ms) / (ms.sum() / 1000), 2) if ms.sum() else None,
+        'peak_mib': round(peak / 2 ** 20, 3),
+    }
+
+
+def load_app(csv_path):
+    """Imports the app serving csv_path and waits for its first warm-up; returns (app, seconds)."""
+    os.environ['TRENDMINER_CSV'] = csv_path
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    from app import app
+    client = app.test_client()
+    while client.get('/health').status_code != 200:
+        time.sleep(0.05)
+    return app, time.perf_counter() - started
+
+
+def run(csv_path, iterations, max_seconds, only=None):
+    """Runs the benchmarks; returns the results document."""
+    app, load_seconds = load_app(csv_path)
+    from utils import analytics
+    from utils.cache import RESULT_CACHE
+    from utils.response_cache import RESPONSE_CACHE
+
+    snapshot = app.config['DATASTORE'].snapshot
+    topic = max(snapshot.topics, key=lambda t: snapshot.topics[t]['total_mentions'])
+    print(f"Loaded {len(snapshot.df)} rows from {csv_path} in {load_seconds:.2f}s (including warm-up)")
+
+    def clear_caches():
+        RESULT_CACHE.clear()
+        RESPONSE_CACHE.clear()
+
+    client = app.test_client()
+    benchmarks = []
+    for route in ROUTES:
+        url = route.format(topic=quote(topic))
+
+        def get(url=url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        benchmarks.append((f'route cold {route}', get, clear_caches))
+        benchmarks.append((f'route cached {route}', get, None))
+    for name, call in analytics_benchmarks(analytics, snapshot, topic):
+        benchmarks.append((f'analytics {name}', call, clear_caches))
+
+    results = {}
+    print(f"{'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'peak MiB':>9}  benchmark")
+    for name, call, before in benchmarks:
+        if only and not any(o in name for o in only):
+            continue
+        result = results[name] = measure(call, iterations, max_seconds, before)
+        print(f"{result['p50_ms']:>10.2f} {result['p90_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+              f"{result['ops_per_s'] or 0:>10.1f} {result['peak_mib']:>9.2f}  {name}")
+
+    return {
+        'meta': {
+            'csv': os.path.relpath(csv_path, ROOT),
+            'rows': len(snapshot.df),
+            'load_seconds': round(load_seconds, 3),
+            'iterations': iterations,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def compare(document, baseline, threshold):
+    """Prints median and peak-memory ratios against a baseline; returns the names that regressed."""
+    if document['meta']['rows'] != baseline['meta']['rows']:
+        print(f"Warning: baseline has {baseline['meta']['rows']} rows, this run {document['meta']['rows']}")
+    regressions = []
+    print(f"{'base p50':>10} {'p50':>10} {'ratio':>7} {'peak ratio':>10}  benchmark")
+    for name, result in document['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['p50_ms'] / base['p50_ms'] if base['p50_ms'] else float('inf')
+        peak_ratio = result['peak_mib'] / base['peak_mib'] if base['peak_mib'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  <- slower'
+        print(f"{base['p50_ms']:>10.2f} {result['p50_ms']:>10.2f} {ratio:>7.2f} {peak_ratio:>10.2f}  {name}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10k', help='synthetic dataset size, e.g. 10k, 1m, 10m; generated on first use')
+    parser.add_argument('--csv', help='benchmark this CSV instead of a synthetic dataset')
+    parser.add_argument('--seed', type=int, default=0, help='seed for a newly generated dataset')
+    parser.add_argument('--iterations', type=int, default=20, help='timed runs per benchmark')
+    parser.add_argument('--max-seconds', type=float, default=10, help='stop a benchmark early after this long')
+    parser.add_argument('--only', action='append', help='run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON baseline to compare the results against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='median slowdown ratio counted as a regression')
+    args = parser.parse_args()
+
+    csv_path = os.path.abspath(args.csv) if args.csv else None
+    if csv_path is None:
+        rows = parse_rows(args.rows)
+        csv_path = os.path.join(ROOT, 'data', f'synthetic_{size_label(rows)}.csv')
+        if not os.path.exists(csv_path):
+            print(f"Generating {rows} rows into {csv_path}...")
+            write_csv(csv_path, rows, seed=args.seed)
+
+    document = run(csv_path, args.iterations, args.max_seconds, args.only)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(document, f, indent=1, sort_keys=True)
+        print(f"Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(document, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.2f}x")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Generates synthetic posts with the same schema as the bundled dataset.
+
+    python bench/generate.py --rows 1m [--out data/synthetic_1m.csv] [--seed 0] [--days 90]
+
+Distributions are fitted to data/mock_social_trends_5000.csv and then
+skewed the way real traffic is: topic popularity follows the sample, user
+activity follows a power law, each topic trends up or down over the window
+and has a few burst days, engagement keeps the sample's heavy tail, and
+posting follows the sample's time of day. Rows are written in chunks, so
+10M-row files need no more memory than 10k-row ones. The same seed, size
+and --end always give the same file.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CSV = os.path.join(ROOT, 'data', 'mock_social_trends_5000.csv')
+COLUMNS = ['post_id', 'platform', 'user', 'content', 'hashtags', 'topic', 'likes', 'shares', 'comments',
+           'sentiment', 'timestamp', 'region']
+CHUNK_ROWS = 100000
+FIRST_POST_ID = 100000
+# Distinct authors per row; activity within them is heavily skewed
+USERS_PER_ROW = 0.25
+# Share of a topic's posts that land on its burst days
+BURST_SHARE = 0.08
+BURST_DAYS = 3
+SIZE_SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6}
+
+
+def parse_rows(text):
+    """Row counts like '10k', '1m' or '2500'."""
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(rows):
+    """Short label for a row count: 10000 -> '10k', 1000000 -> '1m'."""
+    for suffix, scale in sorted(SIZE_SUFFIXES.items(), key=lambda s: -s[1]):
+        if rows >= scale and rows % scale == 0:
+            return f'{rows // scale}{suffix}'
+    return str(rows)
+
+
+def _shares(series):
+    """Distinct values and their frequencies."""
+    counts = series.value_counts()
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+class SampleProfile:
+    """The distributions the generator draws from, fitted to the sample CSV."""
+
+    def __init__(self, sample):
+        self.topics, self.topic_p = _shares(sample['topic'])
+        self.platforms, self.platform_p = _shares(sample['platform'])
+        self.regions, self.region_p = _shares(sample['region'])
+        self.sentiments = np.array(sorted(sample['sentiment'].unique()))
+
+        texts = sample['content'].str.replace(r'(\s#\S+)+\s*$', '', regex=True)
+        tags = sample['hashtags'].str.split(',')
+        self.templates, self.template_start, self.template_count = [], [], []
+        self.tags, self.tag_p = [], []
+        self.sentiment_cdf = []
+        for topic in self.topics:
+            rows = (sample['topic'] == topic).to_numpy()
+            topic_templates = texts[rows].unique().tolist()
+            self.template_start.append(len(self.templates))
+            self.template_count.append(len(topic_templates))
+            self.templates.extend(topic_templates)
+            topic_tags, topic_tag_p = _shares(tags[rows].explode())
+            self.tags.append(topic_tags)
+            self.tag_p.append(topic_tag_p)
+            sentiment_p = sample.loc[rows, 'sentiment'].value_counts(normalize=True)
+            self.sentiment_cdf.append(np.cumsum(sentiment_p.reindex(self.sentiments, fill_value=0).to_numpy()))
+        self.templates = np.array(self.templates, dtype=object)
+        self.template_start = np.array(self.template_start)
+        self.template_count = np.array(self.template_count)
+        self.sentiment_cdf = np.array(self.sentiment_cdf)
+        self.extra_tag_p = float((sample['content'].str.count('#') > tags.str.len()).mean())
+
+        # Authors: name stems per platform ('@dailyfeed', 'u/newsbot', ...), or the
+        # platform's few fixed accounts when it has no per-user names
+        self.user_stems, self.accounts = {}, {}
+        for platform in self.platforms:
+            users = sample.loc[sample['platform'] == platform, 'user']
+            stems = users.str.replace(r'\d+$', '', regex=True)
+            if users.nunique() <= 10:
+                self.accounts[platform] = _shares(users)
+            else:
+                self.user_stems[platform] = np.array(sorted(stems.unique()), dtype=object)
+
+        self.engagement = sample[['likes', 'shares', 'comments']].to_numpy()
+        hours = pd.to_datetime(sample['timestamp'], utc=True).dt.hour
+        self.hour_p = hours.value_counts(normalize=True).reindex(range(24), fill_value=0).to_numpy()
+
+
+def _choose(rng, values, p, n):
+    return values[rng.choice(len(values), size=n, p=p)]
+
+
+def _users(rng, profile, platforms, n_users):
+    """Author names: a power law over each platform's users, so a few post a lot."""
+    users = np.empty(len(platforms), dtype=object)
+    for platform in np.unique(platforms):
+        rows = np.flatnonzero(platforms == platform)
+        if platform in profile.accounts:
+            users[rows] = _choose(rng, *profile.accounts[platform], len(rows))
+            continue
+        stems = profile.user_stems[platform]
+        ranks = (n_users * rng.random(len(rows)) ** 3).astype(np.int64)
+        names = pd.Series(stems[ranks % len(stems)]) + pd.Series(ranks // len(stems) + 1000).astype(str)
+        users[rows] = names.to_numpy()
+    return users
+
+
+def _hashtags(rng, profile, topics):
+    """Two distinct tags from each post's topic, plus an occasional repeat in the text."""
+    first = np.empty(len(topics), dtype=object)
+    second = np.empty(len(topics), dtype=object)
+    for t in np.unique(topics):
+        rows = np.flatnonzero(topics == t)
+        pool, p = profile.tags[t], profile.tag_p[t]
+        a = rng.choice(len(pool), size=len(rows), p=p)
+        b = rng.choice(len(pool), size=len(rows), p=p)
+        b = np.where(a == b, (b + 1) % len(pool), b)
+        first[rows], second[rows] = pool[a], pool[b]
+    extra = np.where(rng.random(len(topics)) < profile.extra_tag_p, ' ' + first, '')
+    return first, second, extra
+
+
+def generate(rows, seed=0, days=90, end=None, chunk_rows=CHUNK_ROWS, sample_csv=SAMPLE_CSV):
+    """Yields DataFrames of synthetic posts, chunk_rows at a time, rows in total."""
+    rng = np.random.default_rng(seed)
+    profile = SampleProfile(pd.read_csv(sample_csv))
+    end = pd.Timestamp(end if end is not None else pd.Timestamp.now(tz='UTC').floor('D'))
+    end = end.tz_localize('UTC') if end.tzinfo is None else end.tz_convert('UTC')
+    start_s = end.value // 10 ** 9 - days * 86400
+
+    n_topics = len(profile.topics)
+    # Topics rise (slope > 0) or fade over the window; bursts are per-topic news days
+    slopes = rng.normal(0, 0.8, n_topics)
+    burst_days = rng.integers(0, days, (n_topics, BURST_DAYS))
+    n_users = max(1000, int(rows * USERS_PER_ROW))
+
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        topics = rng.choice(n_topics, size=n, p=profile.topic_p)
+        platforms = _choose(rng, profile.platforms, profile.platform_p, n)
+
+        day = (days * rng.random(n) ** np.exp(-slopes[topics])).astype(np.int64)
+        burst = rng.random(n) < BURST_SHARE
+        day[burst] = burst_days[topics[burst], rng.integers(0, BURST_DAYS, burst.sum())]
+        hour = rng.choice(24, size=n, p=profile.hour_p)
+        seconds = start_s + np.minimum(day, days - 1) * 86400 + hour * 3600 + rng.integers(0, 3600, n)
+        stamps = np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s')
+
+        template = profile.template_start[topics] + (rng.random(n) * profile.template_count[topics]).astype(np.int64)
+        first, second, extra = _hashtags(rng, profile, topics)
+        engagement = profile.engagement[rng.integers(0, len(profile.engagement), n)]
+        engagement = np.rint(engagement * rng.lognormal(0, 0.25, (n, 1))).astype(np.int64)
+        sentiment = (rng.random(n)[:, None] > profile.sentiment_cdf[topics]).sum(axis=1)
+
+        yield pd.DataFrame({
+            'post_id': np.arange(FIRST_POST_ID + offset, FIRST_POST_ID + offset + n),
+            'platform': platforms,
+            'user': _users(rng, profile, platforms, n_users),
+            'content': profile.templates[template] + ' ' + first + ' ' + second + extra,
+            'hashtags': first + ',' + second,
+            'topic': profile.topics[topics],
+            'likes': engagement[:, 0],
+            'shares': engagement[:, 1],
+            'comments': engagement[:, 2],
+            'sentiment': profile.sentiments[np.minimum(sentiment, len(profile.sentiments) - 1)],
+            'timestamp': np.char.add(stamps, 'Z'),
+            'region': _choose(rng, profile.regions, profile.region_p, n),
+        }, columns=COLUMNS)
+
+
+def write_csv(path, rows, **kwargs):
+    """Writes a synthetic dataset of rows posts to path, chunk by chunk."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(generate(rows, **kwargs)):
+            chunk.to_csv(f, index=False, header=i == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10k', help="row count, e.g. 10k, 1m, 10m")
+    parser.add_argument('--out', help='CSV path (default data/synthetic_<rows>.csv)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--days', type=int, default=90, help='length of the time window')
+    parser.add_argument('--end', help='end of the time window (default: today, UTC)')
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    path = args.out or os.path.join(ROOT, 'data', f'synthetic_{size_label(rows)}.csv')
+    started = time.perf_counter()
+    write_csv(path, rows, seed=args.seed, days=args.days, end=args.end)
+    print(f"Wrote {rows} rows to {path} ({os.path.getsize(path) / 2 ** 20:.1f} MiB) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Reports what importing the API modules costs, from python -X importtime.
+
+    python bench/import_time.py [--top 20] [--budget-ms 600] [module ...]
+
+Each run imports the modules in a fresh interpreter and prints the slowest
+imports by cumulative time. With --budget-ms the exit status is 1 when the
+total exceeds the budget, so startup regressions fail CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Everything app.py pulls in through its blueprints
+DEFAULT_MODULES = ['routes.dashboard', 'routes.trends', 'routes.patterns', 'routes.topics']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(modules):
+    """Runs the imports in a fresh interpreter; returns [(module, self us, cumulative us, depth)] in import order."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr}")
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=20, help='number of imports to list')
+    parser.add_argument('--budget-ms', type=float, help='fail when the total import time exceeds this')
+    args = parser.parse_args()
+
+    times = import_times(args.modules)
+    # The requested modules' top-level entries cover everything they import;
+    # interpreter startup (site, encodings) is left out
+    total_ms = sum(cumulative for name, _, cumulative, depth in times if depth == 0 and name in args.modules) / 1000
+    print(f"Importing {', '.join(args.modules)}: {total_ms:.1f} ms, {len(times)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, _ in sorted(times, key=lambda t: -t[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Import time {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
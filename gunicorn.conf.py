@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Production serving: `gunicorn -c gunicorn.conf.py`. One loader process
+# builds and refreshes the snapshots; every worker maps them read-only, so
+# data memory doesn't grow with the number of workers.
+wsgi_app = 'app:app'
+bind = os.environ.get('BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threaded workers: a request waiting on heavy analytics in the offload pool
+# holds one thread, and the worker's other threads keep answering cheap
+# endpoints. A sync worker would queue everything behind it.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Workers are forked before the app loads, so each attaches to the shared snapshot itself
+preload_app = False
+
+os.environ.setdefault('TRENDMINER_SHARED_SNAPSHOTS', os.path.join('data', 'shared'))
+_loader = None
+
+
+def on_starting(server):
+    global _loader
+    _loader = subprocess.Popen([sys.executable, 'loader.py', '--shared-dir', os.environ['TRENDMINER_SHARED_SNAPSHOTS']])
+
+
+def on_exit(server):
+    if _loader is not None:
+        _loader.terminate()
+        _loader.wait()
@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+
+from utils.analytics import build_indexes
+from utils.data_loader import DataStore
+from utils.shared_snapshot import publish_snapshot
+
+# Loader process for multi-process serving: it alone parses the CSV and
+# refreshes, and publishes each snapshot for the web workers to map read-only
+# (see gunicorn.conf.py). Workers find it through TRENDMINER_SHARED_SNAPSHOTS.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds snapshots and shares them with web workers.')
+    parser.add_argument('--csv', default=os.environ.get('TRENDMINER_CSV', 'data/mock_social_trends_5000.csv'))
+    parser.add_argument('--shared-dir', default=os.environ.get('TRENDMINER_SHARED_SNAPSHOTS', 'data/shared'))
+    parser.add_argument('--refresh-minutes', type=int, default=5)
+    args = parser.parse_args()
+
+    store = DataStore(csv_path=args.csv, refresh_minutes=args.refresh_minutes)
+
+    def publish(snapshot):
+        # Indexes built here are mapped by every worker instead of rebuilt in each
+        build_indexes(snapshot)
+        path = publish_snapshot(snapshot, args.shared_dir)
+        print(f"Published snapshot {snapshot.version} to {path}")
+
+    # Refreshed snapshots are published before the loader swaps to them
+    store.on_build(publish)
+    publish(store.snapshot)
+    while True: # Refreshes run on the DataStore's scheduler thread
+        time.sleep(3600)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,24 @@
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, g, request
 from utils.analytics import (
+    CLOCK_TTL,
     tracked_trends_count,
     active_topics_count,
     updated_recently_count,
     platform_breakdown,
     compute_relevance_score,
-    format_post_for_response
+    trending_posts
 )
+from utils.data_loader import category_mask
+from utils.metrics import stage
+from utils.offload import Overloaded
+from utils.response_cache import cached_response
+from utils.serialization import json_response, post_records
+from utils.topk import decode_cursor
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/summary')
+@cached_response(ttl=CLOCK_TTL)
 def summary():
     """
     GET /api/dashboard/summary
@@ -18,7 +26,7 @@ def summary():
     Returns dashboard summary statistics
     """
     try:
-        ds = current_app.config['DATASTORE']
+        ds = g.snapshot
         
         # Compute statistics
         tracked = tracked_trends_count(ds)
@@ -48,43 +56,52 @@ def summary():
             'top_topics': top_topics
         }
         
-        return jsonify(response)
+        return json_response(response)
     
+    except Overloaded:
+        raise # Shed load: the app answers 503 with Retry-After
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @dashboard_bp.route('/for-you')
+@cached_response(ttl=CLOCK_TTL)
 def for_you():
     """
-    GET /api/dashboard/for-you?interests=ai,ev,coding&region=India&limit=20
+    GET /api/dashboard/for-you?interests=ai,ev,coding&region=India&limit=20&after=<cursor>
     
-    Returns personalized feed based on user interests
+    Returns personalized feed based on user interests. Pass the returned
+    next_cursor as after= to fetch the following page.
     """
     try:
-        ds = current_app.config['DATASTORE']
+        ds = g.snapshot
         
         # Get query parameters
         interests = request.args.get('interests', '')
         region = request.args.get('region')
         limit = int(request.args.get('limit', 20))
+        if limit < 0:
+            return json_response({'error': 'limit must not be negative'}), 400
+        after = request.args.get('after')
+        if after:
+            try:
+                after = decode_cursor(after, ds.version)
+            except ValueError as e:
+                return json_response({'error': str(e)}), 400
         
-        # Compute relevance scores
-        relevance_score, matched_posts = compute_relevance_score(ds, interests, region)
+        # Compute relevance scores; only the rows on this page are materialized
+        relevance_score, page, next_cursor = compute_relevance_score(
+            ds, interests, region, limit=limit, after=after or None
+        )
         
-        # Format posts for response
-        for_you_posts = []
-        for _, row in matched_posts.head(limit).iterrows():
-            post = format_post_for_response(row)
-            post['relevance_score'] = round(float(row['relevance']), 2)
-            for_you_posts.append(post)
+        # Format posts for response, a column at a time
+        with stage('format_posts'):
+            for_you_posts = post_records(page, relevance_score=[round(r, 2) for r in page['relevance'].tolist()])
         
         # Get trending posts (high engagement + recent)
-        trending_posts = []
-        df_trending = matched_posts[matched_posts['recency_weight'] > 0.5].nlargest(limit, 'engagement')
-        for _, row in df_trending.head(10).iterrows():
-            post = format_post_for_response(row)
-            post['relevance_score'] = round(float(row['relevance']), 2)
-            trending_posts.append(post)
+        with stage('trending_posts'):
+            hot = trending_posts(ds, interests, region, limit=min(limit, 10))
+        with stage('format_posts'):
+            trending = post_records(hot, relevance_score=[round(r, 2) for r in hot['relevance'].tolist()])
         
         # Following posts (if user has followed topics - placeholder)
         following_posts = []
@@ -92,16 +109,20 @@ def for_you():
         response = {
             'relevance_score': round(relevance_score, 2),
             'for_you': for_you_posts,
-            'trending': trending_posts,
-            'following': following_posts
+            'trending': trending,
+            'following': following_posts,
+            'next_cursor': next_cursor
         }
         
-        return jsonify(response)
+        return json_response(response)
     
+    except Overloaded:
+        raise # Shed load: the app answers 503 with Retry-After
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @dashboard_bp.route('/stats')
+@cached_response()
 def stats():
     """
     GET /api/dashboard/stats
@@ -109,7 +130,7 @@ def stats():
     Returns additional dashboard statistics
     """
     try:
-        ds = current_app.config['DATASTORE']
+        ds = g.snapshot
         df = ds.df
         
         # Compute various stats
@@ -125,14 +146,17 @@ def stats():
             'platform_stats': platform_stats
         }
         
-        return jsonify(response)
+        return json_response(response)
     
+    except Overloaded:
+        raise # Shed load: the app answers 503 with Retry-After
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 def sentiment_distribution(df):
     """Calculate sentiment distribution"""
-    sentiment_counts = df['sentiment'].value_counts().to_dict()
+    sentiment_counts = df['sentiment'].value_counts()
+    sentiment_counts = sentiment_counts[sentiment_counts > 0].to_dict()
     total = len(df)
     return {
         k: {
@@ -146,7 +170,7 @@ def platform_detailed_stats(df):
     """Get detailed statistics per platform"""
     stats = {}
     for platform in df['platform'].unique():
-        pdata = df[df['platform'] == platform]
+        pdata = df[category_mask(df['platform'], platform)]
         stats[platform] = {
             'posts': len(pdata),
             'total_likes': int(pdata['likes'].sum()),
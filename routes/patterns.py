@@ -1,55 +1,78 @@
-from flask import Blueprint, current_app, jsonify, request
-from utils.analytics import pattern_rules
+from flask import Blueprint, g, request
+from utils.analytics import RULE_ITEM_KINDS, association_rules, graph_view, pattern_rules
+from utils.response_cache import cached_response
+from utils.serialization import json_response
 
 patterns_bp = Blueprint('patterns', __name__)
 
 @patterns_bp.route('/top')
+@cached_response()
 def top_patterns():
     """Identifies and returns top co-occurrence patterns between topics and phrases."""
     limit = int(request.args.get('limit', 50))
-    ds = current_app.config['DATASTORE']
+    ds = g.snapshot
 
     if ds.df.empty:
-        return jsonify([])
+        return json_response([])
 
     res = pattern_rules(ds, limit=limit)
-    return jsonify(res)
+    return json_response(res)
+
+@patterns_bp.route('/rules')
+@cached_response()
+def rules():
+    """
+    GET /api/patterns/rules?min_support=0.01&min_confidence=0.5&min_lift=1&max_len=3&items=topic,hashtag&limit=50
+
+    Returns association rules mined from frequent itemsets of post topics,
+    hashtags, platforms, regions and phrases (items= picks the kinds).
+    """
+    ds = g.snapshot
+    try:
+        min_support = float(request.args.get('min_support', 0.01))
+        min_confidence = float(request.args.get('min_confidence', 0.5))
+        min_lift = float(request.args.get('min_lift', 1.0))
+        max_len = int(request.args.get('max_len', 3))
+        limit = int(request.args.get('limit', 50))
+        kinds = tuple(k.strip() for k in request.args.get('items', ','.join(RULE_ITEM_KINDS)).split(',') if k.strip())
+        if not 0 < min_support <= 1 or not 0 <= min_confidence <= 1 or min_lift < 0:
+            raise ValueError("min_support must be in (0, 1], min_confidence in [0, 1] and min_lift >= 0")
+        if not 2 <= max_len <= 5:
+            raise ValueError("max_len must be between 2 and 5")
+        unknown = set(kinds) - set(RULE_ITEM_KINDS)
+        if unknown or not kinds:
+            raise ValueError(f"items must be a subset of {', '.join(RULE_ITEM_KINDS)}")
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+
+    if ds.df.empty:
+        return json_response([])
+
+    res = association_rules(ds, min_support=min_support, min_confidence=min_confidence, min_lift=min_lift,
+                            max_len=max_len, kinds=tuple(dict.fromkeys(kinds)), limit=limit)
+    return json_response(res)
 
 @patterns_bp.route('/graph')
+@cached_response()
 def graph():
-    """Generates data for a topic co-occurrence network graph."""
-    ds = current_app.config['DATASTORE']
+    """
+    GET /api/patterns/graph?min_weight=2&top_n_edges=100&node=<topic or #tag>
+
+    Returns the topic/hashtag co-occurrence network: edge weights count the
+    posts two nodes share. With node= only that node's neighbourhood is returned.
+    """
+    ds = g.snapshot
+    try:
+        min_weight = int(request.args.get('min_weight', 2))
+        top_n_edges = int(request.args.get('top_n_edges', 100))
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    node = request.args.get('node') or None
 
     if ds.df.empty:
-        return jsonify({'nodes': [], 'edges': []})
-        
-    # Use a higher limit for better graph connectivity, but keep it reasonable
-    rules = pattern_rules(ds, limit=100, min_cooccurrence=2)
-    
-    # Build nodes and edges
-    topics = list(ds.topics.keys())
-    nodes = [{'id': t, 'label': t, 'size': ds.topics.get(t, {}).get('total_mentions', 0)} for t in topics]
-
-    # Approximate edges from rules by parsing topic names
-    # This is a simple heuristic; a more advanced approach might use NLP to extract entities
-    edges = []
-    edge_counts = {} # To aggregate weights
-    
-    for r in rules:
-        rule_text = r.get('rule', '')
-        # Simple heuristic to find topic co-occurrence
-        for t1 in topics:
-            if t1 in rule_text:
-                 for t2 in topics:
-                     if t2 in rule_text and t1 != t2:
-                         # Create a consistent key for each pair to avoid duplicate edges
-                         edge_key = tuple(sorted((t1, t2)))
-                         if edge_key not in edge_counts:
-                             edge_counts[edge_key] = 0
-                         edge_counts[edge_key] += r.get('cooccurrence_count', 0)
-    
-    for (source, target), weight in edge_counts.items():
-        edges.append({'source': source, 'target': target, 'weight': weight})
-
-
-    return jsonify({'nodes': nodes, 'edges': edges})
\ No newline at end of file
+        return json_response({'nodes': [], 'edges': []})
+
+    res = graph_view(ds, min_weight=min_weight, top_n_edges=top_n_edges, node=node)
+    if res is None:
+        return json_response({'error': 'Node not found'}), 404
+    return json_response(res)
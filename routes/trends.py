@@ -1,22 +1,26 @@
-from flask import Blueprint, current_app, jsonify, request
-from utils.analytics import analyze_trends, platform_comparison
+from flask import Blueprint, g, request
+from utils.analytics import CLOCK_TTL, analyze_trends, platform_comparison
+from utils.response_cache import cached_response
+from utils.serialization import json_response
 
 trends_bp = Blueprint('trends', __name__)
 
 @trends_bp.route('/overview')
+@cached_response(ttl=CLOCK_TTL)
 def overview():
     """Provides an overview of emerging, declining, and peak topics."""
     days = int(request.args.get('days', 90))
-    ds = current_app.config['DATASTORE']
+    ds = g.snapshot
     if ds.df.empty:
-        return jsonify({
+        return json_response({
             "emerging_topics": [], "declining_topics": [], "peak_topics": [], "active_topics": [],
             "trend_timeline": {"categories": [], "series": {}}
         })
     res = analyze_trends(ds, days=days)
-    return jsonify(res)
+    return json_response(res)
 
 @trends_bp.route('/platform-comparison')
+@cached_response()
 def platform_comp():
     """Compares topic performance across different platforms."""
     topic = request.args.get('topic')
@@ -24,11 +28,11 @@ def platform_comp():
     end = request.args.get('end')
     
     if not topic:
-        return jsonify({"error": "Topic parameter is required"}), 400
+        return json_response({"error": "Topic parameter is required"}), 400
 
-    ds = current_app.config['DATASTORE']
+    ds = g.snapshot
     if ds.df.empty:
-        return jsonify({})
+        return json_response({})
 
     res = platform_comparison(ds, topic, start=start, end=end)
-    return jsonify(res)
\ No newline at end of file
+    return json_response(res)
\ No newline at end of file
@@ -1,6 +1,4 @@
-from app import create_app
-
-app = create_app()
-
+# Started under the guard: process pools re-import this module in their workers
 if __name__ == '__main__':
-    app.run(debug=True, host='localhost', port=8080)
\ No newline at end of file
+    from app import app
+    app.run(debug=True, host='localhost', port=8080)
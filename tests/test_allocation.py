@@ -0,0 +1,82 @@
+"""Checks that serving a request allocates in proportion to its result, not the dataset.
+
+Every hot endpoint is requested once on synthetic data from bench/generate.py
+with the result and response caches cleared (snapshot indexes are kept, as
+in production), and its tracemalloc peak must stay under BYTES_PER_ROW per
+dataset row: room for a few float arrays over the candidates while scoring,
+but not for copying or re-parsing the frame.
+Rule mining (/api/patterns/rules) is left out: its item bitsets grow with
+the corpus by design and are bounded by MAX_BITSET_BYTES instead.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from urllib.parse import quote
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+from generate import write_csv
+
+ROWS = 20000
+# Peak bytes a request may trace per dataset row (1.2 MiB at ROWS)
+BYTES_PER_ROW = 64
+HOT_ROUTES = [
+    '/api/dashboard/summary',
+    '/api/dashboard/for-you?interests=ai,ev,coding&limit=20',
+    '/api/dashboard/for-you?interests=ai&region=India&limit=20',
+    '/api/dashboard/stats',
+    '/api/trends/overview?days=90',
+    '/api/trends/platform-comparison?topic={topic}',
+    '/api/patterns/top?limit=50',
+    '/api/patterns/graph',
+    '/api/patterns/graph?node={topic}',
+    '/api/topics/list?query=ai',
+    '/api/topics/detail?topic={topic}',
+]
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    csv_path = str(tmp_path_factory.mktemp('data') / 'synthetic.csv')
+    write_csv(csv_path, ROWS, seed=0, end='2026-01-01')
+    os.environ['TRENDMINER_CSV'] = csv_path
+    from app import app as flask_app # Serves TRENDMINER_CSV, like bench/benchmark.py
+    client = flask_app.test_client()
+    deadline = time.monotonic() + 120
+    while client.get('/health').status_code != 200:
+        assert time.monotonic() < deadline, 'warm-up did not finish'
+        time.sleep(0.05)
+    return flask_app
+
+
+def traced_peak(client, url):
+    tracemalloc.start()
+    try:
+        response = client.get(url)
+        return response, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('route', HOT_ROUTES)
+def test_request_allocation_is_bounded(app, route):
+    from utils.cache import RESULT_CACHE
+    from utils.response_cache import RESPONSE_CACHE
+
+    snapshot = app.config['DATASTORE'].snapshot
+    topic = max(snapshot.topics, key=lambda t: snapshot.topics[t]['total_mentions'])
+    url = route.format(topic=quote(topic))
+    budget = BYTES_PER_ROW * len(snapshot.df)
+
+    client = app.test_client()
+    client.get(url) # Builds the snapshot's derived indexes, which are shared by later requests
+    RESULT_CACHE.clear()
+    RESPONSE_CACHE.clear()
+    response, peak = traced_peak(client, url)
+
+    assert response.status_code == 200
+    assert peak < budget, f'{url} peaked at {peak / 2**20:.2f} MiB, budget {budget / 2**20:.2f} MiB'
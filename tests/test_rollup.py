@@ -0,0 +1,44 @@
+"""Checks that badly dated posts can't stretch the rollup cube's dense day axis."""
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+from generate import write_csv
+from utils.analytics import platform_comparison
+from utils.data_loader import DataStore
+
+DAYS = 90
+
+
+def append_posts(csv_path, timestamps):
+    """Appends copies of the CSV's first post, dated at the given timestamps."""
+    posts = pd.read_csv(csv_path, nrows=1).loc[[0] * len(timestamps)]
+    posts['timestamp'] = timestamps
+    posts.to_csv(csv_path, mode='a', header=False, index=False)
+
+
+def test_outliers_are_left_out_of_the_cube(tmp_path):
+    csv_path = str(tmp_path / 'posts.csv')
+    write_csv(csv_path, 2000, seed=0, days=DAYS, end='2026-01-01')
+    append_posts(csv_path, ['1970-01-01T00:00:00Z', '2099-01-01T00:00:00Z'])
+    store = DataStore(csv_path=csv_path)
+    cube = store.snapshot.rollup
+
+    assert cube.n_days <= DAYS + 1
+    assert cube.dropped == 2
+    assert int(cube.counts.sum()) == 2000
+    # Unbounded ranges read the same rows through the topic index; the outliers must not land on the axis
+    mentions = sum(day['mentions'] for days in platform_comparison(store.snapshot, None).values() for day in days)
+    assert mentions == 2000
+
+    # Rows appended later are merged into the same bounded axis
+    append_posts(csv_path, ['1971-06-01T00:00:00Z', '2025-12-31T12:00:00Z'])
+    store.refresh()
+    merged = store.snapshot.rollup
+    assert merged.n_days == cube.n_days
+    assert merged.dropped == 3
+    assert int(merged.counts.sum()) == 2001
@@ -0,0 +1,54 @@
+"""Checks that workers map a published snapshot's fixed-width frame columns instead of copying them."""
+import mmap
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+from generate import write_csv
+from utils.data_loader import DataStore, Snapshot
+from utils.shared_snapshot import open_snapshot, publish_snapshot
+
+FIXED_WIDTH = ['post_id', 'likes', 'shares', 'comments', 'timestamp', 'platform', 'topic', 'sentiment', 'region',
+               'user']
+
+
+def backing(arr):
+    """The object at the bottom of an array's chain of buffer owners."""
+    while True:
+        owner = arr.obj if isinstance(arr, memoryview) else getattr(arr, 'base', None)
+        if owner is None:
+            return arr
+        arr = owner
+
+
+def column_buffer(col):
+    """The ndarray holding a column's values (its codes for categoricals)."""
+    values = col.array
+    if isinstance(values, pd.Categorical):
+        return values.codes
+    return values._ndarray
+
+
+def test_fixed_width_columns_are_mapped(tmp_path):
+    csv_path = str(tmp_path / 'posts.csv')
+    write_csv(csv_path, 5000, seed=0, end='2026-01-01')
+    snapshot = DataStore(csv_path=csv_path).snapshot
+
+    shared = open_snapshot(publish_snapshot(snapshot, str(tmp_path / 'shared')))
+
+    assert shared.df.equals(snapshot.df)
+    for name in FIXED_WIDTH:
+        assert isinstance(backing(column_buffer(shared.df[name])), mmap.mmap), name
+    # Snapshot-level arrays were already mapped; they must stay so
+    assert isinstance(backing(shared.engagement), mmap.mmap)
+
+
+def test_empty_snapshot_round_trips(tmp_path):
+    shared = open_snapshot(publish_snapshot(Snapshot(pd.DataFrame()), str(tmp_path)))
+    assert shared.df.empty
+    assert np.array_equal(shared.engagement, np.empty(0))
@@ -0,0 +1,52 @@
+"""Checks that ETags and feed cursors from one server process are not honoured by the next.
+
+Each probe is a fresh process serving its own CSV, as after a restart or a
+redeploy with new data: it replays the previous process's ETag and cursor
+and reports what it got back.
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+from generate import write_csv
+
+PROBE = '''
+import json, sys, time
+from app import app
+client = app.test_client()
+while client.get('/health').status_code != 200:
+    time.sleep(0.05)
+etag, cursor = sys.argv[1:3]
+stats = client.get('/api/dashboard/stats')
+feed = client.get('/api/dashboard/for-you?interests=ai&limit=5').get_json()
+print(json.dumps({
+    'etag': stats.headers['ETag'],
+    'cursor': feed['next_cursor'],
+    'revalidated': client.get('/api/dashboard/stats', headers={'If-None-Match': etag}).status_code,
+    'paged': client.get('/api/dashboard/for-you?interests=ai&limit=5&after=' + cursor).status_code,
+}))
+'''
+
+
+def probe(csv_path, etag='"none"', cursor='none'):
+    env = dict(os.environ, TRENDMINER_CSV=csv_path)
+    out = subprocess.run([sys.executable, '-c', PROBE, etag, cursor], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=300, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_restart_invalidates_etags_and_cursors(tmp_path):
+    first_csv, second_csv = str(tmp_path / 'first.csv'), str(tmp_path / 'second.csv')
+    write_csv(first_csv, 5000, seed=0, end='2026-01-01')
+    write_csv(second_csv, 2000, seed=1, end='2026-01-01')
+
+    first = probe(first_csv)
+    second = probe(second_csv, first['etag'], first['cursor'])
+
+    assert second['etag'] != first['etag']
+    assert second['revalidated'] == 200 # Not 304: the old body is stale
+    assert second['paged'] == 400 # The cursor points into the previous process's snapshot
@@ -1,88 +1,51 @@
 import pandas as pd
 import numpy as np
-from collections import Counter, defaultdict
+from collections import Counter, defaultdict, namedtuple
 from datetime import datetime, timedelta
+import functools
+import heapq
+import itertools
 import math
+import os
 import re
 from dateutil import parser
-from functools import lru_cache
-import nltk # Import nltk
-
-# --- Setup NLTK ---
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    print("Downloading NLTK stopwords...")
-    nltk.download('stopwords')
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-     print("Downloading NLTK punkt tokenizer...")
-     nltk.download('punkt')
-# --- End NLTK Setup ---
-
-
-from nltk.corpus import stopwords as nltk_stopwords
-
-# More comprehensive stopwords including common English words and potentially irrelevant terms
-STOPWORDS = set(nltk_stopwords.words('english')) | set([
-    'a', 'an', 'the', 'and', 'or', 'for', 'to', 'in', 'on', 'with', 'at', 'by', 'is', 'are', 'was', 'were', 'of',
-    'it', 'its', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'we', 'they', 'me', 'him', 'her', 'us', 'them',
-    'my', 'your', 'his', 'her', 'its', 'our', 'their', 'mine', 'yours', 'hers', 'ours', 'theirs',
-    'be', 'being', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'shall', 'should', 'can', 'could',
-    'may', 'might', 'must',
-    'about', 'above', 'after', 'again', 'against', 'all', 'am', 'any', 'as', 'because', 'before', 'below',
-    'between', 'both', 'but', 'came', 'come', 'couldnt', 'didnt', 'do', 'does', 'doing', 'dont', 'down', 'during',
-    'each', 'few', 'from', 'further', 'get', 'go', 'goes', 'got', 'hadnt', 'hasnt', 'havent', 'having', 'hed',
-    'hell', 'here', 'heres', 'herself', 'hes', 'himself', 'how', 'hows', 'id', 'ill', 'im', 'ive', 'if', 'into',
-    'isnt', 'lets', 'like', 'make', 'many', 'more', 'most', 'much', 'no', 'nor', 'not', 'now', 'off', 'once',
-    'only', 'other', 'ought', 'our', 'ours', 'ourselves', 'out', 'over', 'own', 'same', 'shant', 'shed',
-    'shell', 'shes', 'so', 'some', 'such', 'than', 'thats', 'the', 'their', 'theirs', 'them', 'themselves',
-    'then', 'there', 'theres', 'these', 'theyd', 'theyll', 'theyre', 'theyve', 'this', 'those', 'through',
-    'too', 'under', 'until', 'up', 'very', 'want', 'wasnt', 'wed', 'well', 'were', 'werent', 'weve', 'what',
-    'whats', 'when', 'whens', 'where', 'wheres', 'which', 'while', 'who', 'whos', 'whom', 'why', 'whys',
-    'wont', 'wouldnt', 'youd', 'youll', 'youre', 'youve', 'your', 'yours', 'yourself', 'yourselves',
-    'rt', 'via', 'amp', 'new', 'one', 'post', 'see', 'also', 'just', 'like', 'know', 'get', 'think', 'thoughts' # Added common social media words
-])
-
-
-# --- Helper Functions ---
-
-def format_post_for_response(row):
-    """Format a DataFrame row into a post response dictionary."""
-    return {
-        'post_id': str(row.get('post_id', '')),
-        'platform': str(row.get('platform', '')),
-        'user': str(row.get('user', '')),
-        'content': str(row.get('content', '')),
-        'hashtags': str(row.get('hashtags', '')),
-        'topic': str(row.get('topic', '')),
-        'likes': int(row.get('likes', 0)),
-        'shares': int(row.get('shares', 0)),
-        'comments': int(row.get('comments', 0)),
-        'sentiment': str(row.get('sentiment', '')),
-        'timestamp': str(row.get('timestamp', '')),
-        'region': str(row.get('region', ''))
-    }
+from utils.cache import cached
+from utils.metrics import stage
+from utils.offload import offloaded
+from utils.topk import encode_cursor, top_k
+from utils.data_loader import TOKEN_RE, category_codes, category_mask, searchable_text
+from utils.mining import frequent_itemsets, pack_transactions, rules_from_itemsets
+from utils.serialization import records
+from utils.rollup import NAT_NS, NS_PER_DAY
+
+# Stopwords dropped from phrases: NLTK's English list plus social-media filler,
+# vendored so startup needs neither nltk nor network access
+STOPWORDS_PATH = os.path.join(os.path.dirname(__file__), 'stopwords.txt')
+
+
+@functools.lru_cache(maxsize=None)
+def stopwords():
+    """The stopword set, read from STOPWORDS_PATH on first use."""
+    with open(STOPWORDS_PATH, encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+
+# Results that depend on "now" (recency windows and weights) are only reused for this many seconds
+CLOCK_TTL = 60
+
 
 # --- Dashboard Analytics ---
 
-@lru_cache()
+@cached()
 def tracked_trends_count(datastore):
     """Counts unique topics."""
-    # Ensure topics are loaded if dataframe is not empty
-    if not datastore.df.empty and not hasattr(datastore, 'topics'):
-         datastore._build_topic_tables()
     return len(datastore.topics)
 
-@lru_cache()
+@cached(ttl=CLOCK_TTL)
 def active_topics_count(datastore, days=14):
     """Counts topics with mentions in the last N days."""
     if days <= 0 or datastore.df.empty: return 0
-     # Ensure topics are loaded
-    if not hasattr(datastore, 'topics'):
-         datastore._build_topic_tables()
-         
+
     # Use UTC for cutoff calculation consistent with data
     cutoff = pd.Timestamp.utcnow() # Already UTC
     cutoff_naive = cutoff.tz_localize(None) - pd.Timedelta(days=days) # Create naive cutoff for comparison
@@ -97,14 +60,11 @@ def active_topics_count(datastore, days=14):
     return active
 
 
-@lru_cache()
+@cached(ttl=CLOCK_TTL)
 def updated_recently_count(datastore, days=7):
     """Counts topics updated within the last N days."""
     if days <= 0 or datastore.df.empty: return 0
-    # Ensure topics are loaded
-    if not hasattr(datastore, 'topics'):
-        datastore._build_topic_tables()
-        
+
     # Use UTC for cutoff calculation consistent with data
     cutoff = pd.Timestamp.utcnow() # Already UTC
     cutoff_naive = cutoff.tz_localize(None) - pd.Timedelta(days=days) # Create naive cutoff for comparison
@@ -118,98 +78,187 @@ def updated_recently_count(datastore, days=7):
                 recent += 1
     return recent
 
-@lru_cache()
+@cached()
 def platform_breakdown(datastore):
     """Counts posts per platform."""
     if datastore.df.empty:
         return {}
-    return datastore.df['platform'].value_counts().to_dict()
+    return dict(datastore.platform_counts) # Precomputed when the snapshot is built
 
 # --- Personalized Feed ---
 
-def compute_relevance_score(datastore, interests_str, region=None):
-    """Computes relevance scores for posts based on interests and region."""
-    df = datastore.df.copy()
+def interest_rows(datastore, interest):
+    """Row positions whose topic, content or hashtags contain the (lowercase) interest as a whole word."""
+    df = datastore.df
+    tokens = TOKEN_RE.findall(interest)
+    if tokens:
+        # Every word of a whole-word match is itself a token of the post, so
+        # intersecting posting lists gives a superset of the matching rows
+        candidates = datastore.token_rows(tokens[0])
+        for token in tokens[1:]:
+            candidates = np.intersect1d(candidates, datastore.token_rows(token), assume_unique=True)
+        if tokens == [interest]:
+            return candidates # Single-word interests are answered by the index alone
+    else:
+        candidates = np.arange(len(df)) # Nothing to look up; scan everything
+    if len(candidates) == 0:
+        return candidates
 
-    if df.empty:
-         return 0.0, pd.DataFrame(columns=list(df.columns) + ['relevance'])
+    # Multi-word or punctuated interests: confirm the exact phrase on the candidates only
+    pattern = re.compile(r'\b' + re.escape(interest) + r'\b')
+    found = searchable_text(df.iloc[candidates]).str.contains(pattern).to_numpy(dtype=bool)
+    return candidates[found]
 
 
-    interests = [i.strip().lower() for i in interests_str.split(',') if i.strip()]
+# Scores for one (interests, region) query, kept small enough to stay cached at
+# millions of rows: rows are the candidate snapshot row positions (None for every
+# row) and relevance, normalized to 0-100, is aligned with them. Engagement is read
+# from the snapshot and recency recomputed from the scoring time (now, in ns).
+FeedScores = namedtuple('FeedScores', ['rows', 'relevance', 'now'])
 
-    if not interests:
-        return 0.0, df.assign(relevance=0.0) # Return DataFrame with 0 relevance if no interests
+
+def recency_weight(stamps_ns, now):
+    """exp(-days_since_post / 7); missing timestamps and future posts get 0."""
+    # Missing timestamps are penalized heavily
+    days_since_post = np.where(stamps_ns == NAT_NS, np.inf, (now - stamps_ns) / NS_PER_DAY)
+    with np.errstate(over='ignore'):
+        weight = np.exp(-days_since_post / 7) # Decay factor of 7 days
+    weight[days_since_post < 0] = 0 # Future posts get no recency boost
+    return weight
+
+
+def feed_rows(scores, picks):
+    """Snapshot row positions of the picked score positions."""
+    return picks if scores.rows is None else scores.rows[picks]
+
+
+@offloaded(limit=4)
+@cached(ttl=CLOCK_TTL)
+def score_posts(datastore, interests_str, region=None):
+    """Scores every candidate post once for an interests/region query."""
+    df = datastore.df
+    now = pd.Timestamp.utcnow().value
+    if df.empty:
+        return FeedScores(None, np.empty(0), now)
+
+    interests = [i.strip().lower() for i in interests_str.split(',') if i.strip()]
 
     # Filter by region if specified
     if region:
-        df = df[df['region'].str.lower() == region.lower()]
-        if df.empty: # Check if filtering removed all data
-             return 0.0, pd.DataFrame(columns=list(datastore.df.columns) + ['relevance'])
-
-
-    # Calculate base relevance score (keyword matching)
-    def calculate_match(row):
-        score = 0
-        # Combine relevant text fields for matching
-        text_content = f"{row.get('topic', '')} {row.get('content', '')} {row.get('hashtags', '')}".lower()
-        for interest in interests:
-            # Use regex for whole word matching to avoid partial matches (e.g., 'ai' in 'rain')
-            if re.search(r'\b' + re.escape(interest) + r'\b', text_content):
-                score += 1
-        return score
-
-    df['match_score'] = df.apply(calculate_match, axis=1)
-
-    # Calculate engagement weight (using the formula: likes + 2*shares + 0.5*comments)
-    df['likes'] = pd.to_numeric(df['likes'], errors='coerce').fillna(0)
-    df['shares'] = pd.to_numeric(df['shares'], errors='coerce').fillna(0)
-    df['comments'] = pd.to_numeric(df['comments'], errors='coerce').fillna(0)
-    df['engagement'] = df['likes'] + 2 * df['shares'] + 0.5 * df['comments']
-    
-    # Normalize engagement weight (0 to 1)
-    max_engagement = df['engagement'].max()
-    df['engagement_weight'] = df['engagement'] / max_engagement if max_engagement > 0 else 0
-
-    # Calculate recency weight (using the formula: exp(-days_since_post / 7))
-    now = pd.Timestamp.utcnow() # Use timezone-aware comparison
-    # Ensure timestamp column is timezone-aware (UTC)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
-    df['days_since_post'] = (now - df['timestamp']).dt.total_seconds() / (60 * 60 * 24)
-    # Handle potential NaT values in timestamp before calculation
-    df['days_since_post'] = df['days_since_post'].fillna(float('inf')) # Penalize missing timestamps heavily
-    df['recency_weight'] = np.exp(-df['days_since_post'] / 7) # Decay factor of 7 days
-    # Ensure recency_weight is 0 for future posts or NaT timestamps (already handled by fillna(inf))
-    df.loc[df['days_since_post'] < 0, 'recency_weight'] = 0
+        rows = np.flatnonzero(category_mask(df['region'], region, case_insensitive=True))
+        if len(rows) == 0: # Check if filtering removed all data
+             return FeedScores(None, np.empty(0), now)
+        if len(df) <= np.iinfo(np.int32).max:
+            rows = rows.astype(np.int32) # Half the bytes to keep cached
+    else:
+        rows = None
+
+    if not interests:
+        # Without interests nothing is relevant, but trending still uses the candidates
+        return FeedScores(rows, np.zeros(len(df) if rows is None else len(rows)), now)
 
+    # Calculate base relevance score (keyword matching): one point per interest,
+    # summed from the posting lists instead of scanning every post
+    match_score = np.zeros(len(df))
+    for interest in interests:
+        match_score[interest_rows(datastore, interest)] += 1
+    if rows is not None:
+        match_score = match_score[rows]
+
+    # Engagement weight (likes + 2*shares + 0.5*comments), normalized to 0-1
+    engagement = datastore.engagement if rows is None else datastore.engagement[rows]
+    max_engagement = engagement.max()
+    engagement_weight = engagement / max_engagement if max_engagement > 0 else np.zeros(len(engagement))
+
+    # Recency weight: exp(-days_since_post / 7)
+    stamps = datastore.timestamps_ns if rows is None else datastore.timestamps_ns[rows]
 
     # Combine scores with specified weights: 50% match, 30% engagement, 20% recency
-    df['relevance'] = (df['match_score'] * 0.5 +
-                       df['engagement_weight'] * 0.3 +
-                       df['recency_weight'] * 0.2)
+    relevance = match_score * 0.5 + engagement_weight * 0.3 + recency_weight(stamps, now) * 0.2
 
 
     # Normalize final relevance score to 0-100
-    max_relevance = df['relevance'].max()
+    max_relevance = relevance.max()
     if max_relevance > 0:
-        df['relevance'] = (df['relevance'] / max_relevance) * 100
+        relevance = (relevance / max_relevance) * 100
     else:
-        df['relevance'] = 0.0 # Avoid division by zero if all scores are 0
+        relevance = np.zeros(len(relevance)) # Avoid division by zero if all scores are 0
+
+    return FeedScores(rows, relevance, now)
+
+
+def _materialize(datastore, scores, picks):
+    """Builds the response frame for the picked score positions only."""
+    positions = feed_rows(scores, picks)
+    return datastore.df.take(positions).assign(
+        engagement=datastore.engagement[positions],
+        recency_weight=recency_weight(datastore.timestamps_ns[positions], scores.now),
+        relevance=scores.relevance[picks],
+    )
+
+
+def compute_relevance_score(datastore, interests_str, region=None, limit=20, after=None):
+    """Returns (overall relevance, one page of the most relevant posts, cursor for the next page).
+
+    after is a cursor from a previous page; scores are shared with that page
+    through the result cache, so later pages only select, they don't rescore.
+    """
+    with stage('relevance_score'):
+        scores = score_posts(datastore, interests_str, region)
+
+    with stage('relevance_select'):
+        # Overall relevance score: average of the top 10 relevant posts' scores
+        best = top_k(scores.relevance, 10)
+        overall_relevance = float(scores.relevance[best].mean()) if len(best) else 0.0
 
+        picks = top_k(scores.relevance, limit, after=after)
+        next_cursor = None
+        if limit > 0 and len(picks) == limit:
+            last = picks[-1]
+            next_cursor = encode_cursor(datastore.version, scores.relevance[last], last)
 
-    # Sort by relevance
-    matched_posts = df.sort_values(by='relevance', ascending=False)
+    with stage('relevance_materialize'):
+        page = _materialize(datastore, scores, picks)
+    return overall_relevance, page, next_cursor
 
-    # Calculate overall relevance score (e.g., average of top 10 relevant posts' scores)
-    overall_relevance = matched_posts['relevance'].head(10).mean() if not matched_posts.empty else 0.0
 
-    return float(overall_relevance), matched_posts
+def trending_posts(datastore, interests_str, region=None, limit=10):
+    """Highest-engagement recent posts (recency weight above 0.5) among the candidates."""
+    scores = score_posts(datastore, interests_str, region)
+    rows = slice(None) if scores.rows is None else scores.rows
+    recent = recency_weight(datastore.timestamps_ns[rows], scores.now) > 0.5
+    picks = top_k(np.where(recent, datastore.engagement[rows], -np.inf), limit)
+    picks = picks[recent[picks]] # Fewer than limit recent posts leaves -inf fillers
+    return _materialize(datastore, scores, picks)
 
 
 # --- Trend Analysis ---
 
+def recent_topic_day_counts(datastore, cutoff_ns):
+    """Mentions per [topic, day] for posts at or after cutoff_ns, read from the rollup cube.
+
+    Returns (first day index on the cube's day axis, matrix). The cutoff day
+    itself is only partly inside the window, so it is recounted exactly from
+    the per-topic timestamp index.
+    """
+    cube = datastore.rollup
+    cutoff_day = (cutoff_ns // NS_PER_DAY) - cube.first_day
+    first = min(max(cutoff_day, 0), cube.n_days)
+    matrix = cube.topic_day_counts()[:, first:].copy()
+    if 0 <= cutoff_day < cube.n_days:
+        day_end = (cutoff_day + cube.first_day + 1) * NS_PER_DAY
+        offsets, stamps = datastore.topic_offsets, datastore.topic_timestamps
+        for c in range(matrix.shape[0]):
+            lo, hi = np.searchsorted(stamps[offsets[c]:offsets[c + 1]], [cutoff_ns, day_end])
+            matrix[c, 0] = hi - lo
+    return first, matrix
+
+
+@offloaded(limit=2)
+@cached(ttl=CLOCK_TTL)
 def analyze_trends(datastore, days=90):
     """Analyzes trends over the specified number of days, categorizing topics."""
-    df = datastore.df.copy()
+    df = datastore.df
 
     if df.empty or days <= 0:
         return {
@@ -217,93 +266,79 @@ def analyze_trends(datastore, days=90):
             "trend_timeline": {"categories": [], "series": {}}
         }
 
-    cutoff_date = pd.Timestamp.utcnow().tz_localize(None) - pd.Timedelta(days=days) # Naive timestamp for filtering
-    # Ensure timestamps are naive before filtering
-    df['timestamp_naive'] = df['timestamp'].dt.tz_localize(None)
-    df_recent = df[df['timestamp_naive'] >= cutoff_date].copy()
+    cutoff_ns = (pd.Timestamp.utcnow() - pd.Timedelta(days=days)).value
+    first_day, matrix = recent_topic_day_counts(datastore, cutoff_ns)
 
-    if df_recent.empty:
+    if not matrix.any():
         return {
             "emerging_topics": [], "declining_topics": [], "peak_topics": [], "active_topics": [],
             "trend_timeline": {"categories": [], "series": {}}
         }
 
-    # Calculate daily mentions per topic
-    df_recent['day'] = df_recent['timestamp'].dt.normalize() # Keep day timezone aware if possible
-    topic_counts_daily = df_recent.groupby(['topic', 'day']).size().reset_index(name='mentions')
-
+    cube = datastore.rollup
     results = {"emerging_topics": [], "declining_topics": [], "peak_topics": [], "active_topics": []}
-    analyzed_topics = set()
-    
-    # Calculate global mention stats for percentile calculation
-    all_mentions = topic_counts_daily['mentions'].values
-    if len(all_mentions) == 0: # Handle case with no mentions in the period
-         percentile_75 = 0
-    else:
-         percentile_75 = np.percentile(all_mentions, 75)
-
-
-    for topic in topic_counts_daily['topic'].unique():
-        topic_data = topic_counts_daily[topic_counts_daily['topic'] == topic].sort_values('day')
-        mentions = topic_data['mentions'].values
-        dates = topic_data['day'].values # These are normalized timestamps
-
-        # Convert dates to naive for comparison with 'now_naive' if needed
-        # dates_naive = [d.tz_localize(None) for d in dates]
-        last_date_naive = dates[-1].tz_localize(None)
-        now_naive = pd.Timestamp.utcnow().tz_localize(None)
-
-        if len(mentions) < 5: # Require more data points for better trend analysis
-             # Still consider it active if mentioned recently (last 14 days)
-             if (now_naive - last_date_naive).days <= 14:
-                 results["active_topics"].append({"topic": topic, "last_mention_count": int(mentions[-1])})
-             continue
-
-
-        # Growth rate calculation: compare last third to first third of the period for robustness
-        third = len(mentions) // 3
-        if third < 1: third = 1 # Ensure at least one element in slice
-        
-        avg_last = np.mean(mentions[-third:])
-        avg_first = np.mean(mentions[:third])
-
-        growth_rate = avg_last / avg_first if avg_first > 0 else (avg_last + 1) # Add 1 to avoid 0/0 or large number if start is 0
-        current_mean_mentions = np.mean(mentions)
-
-        # Heuristic classification
-        is_active_recently = (now_naive - last_date_naive).days <= 14
-
-        if growth_rate > 1.8 and avg_last > 5 and is_active_recently: # Emerging: Significant growth, recent activity, min mentions
-             results["emerging_topics"].append({"topic": topic, "growth_rate": round(growth_rate, 2), "avg_mentions": round(current_mean_mentions, 1)})
-             analyzed_topics.add(topic)
-        elif growth_rate < 0.6 and avg_first > 5: # Declining: Significant drop from previous activity
-             results["declining_topics"].append({"topic": topic, "decline_rate": round(growth_rate, 2), "avg_mentions": round(current_mean_mentions, 1)})
-             analyzed_topics.add(topic)
-        elif 0.8 <= growth_rate <= 1.2 and current_mean_mentions > percentile_75 and is_active_recently: # Peak: Stable, high mentions relative to others, active recently
-             results["peak_topics"].append({"topic": topic, "avg_mentions": round(current_mean_mentions, 1)})
-             analyzed_topics.add(topic)
-
-        # Active topics check (mentioned in last 14 days) - add if not already categorized
-        if topic not in analyzed_topics and is_active_recently:
-             results["active_topics"].append({"topic": topic, "last_mention_count": int(mentions[-1])})
-             analyzed_topics.add(topic)
+
+    # Each topic's series is its days with mentions, in date order. All per-topic
+    # statistics below are computed for every topic at once on the matrix.
+    mentioned = matrix > 0
+    n_days = mentioned.sum(axis=1)
+    totals = matrix.sum(axis=1)
+    running_sum = np.cumsum(matrix, axis=1)
+    running_days = np.cumsum(mentioned, axis=1)
+
+    # Global percentile over all (topic, day) mention counts in the period
+    percentile_75 = np.percentile(matrix[mentioned], 75)
+
+    # Last day with mentions, and whether it is within the last 14 days
+    last_idx = matrix.shape[1] - 1 - np.argmax(mentioned[:, ::-1], axis=1)
+    last_mentions = matrix[np.arange(len(matrix)), last_idx]
+    last_day_ns = (last_idx + first_day + cube.first_day) * NS_PER_DAY
+    is_active_recently = (pd.Timestamp.utcnow().value - last_day_ns) // NS_PER_DAY <= 14
+
+    # Growth rate: compare the mean of the last third of the series to the first
+    # third, via running sums at the day where the running day count reaches a target
+    third = np.maximum(n_days // 3, 1)
+    def sum_through(count):
+        idx = np.argmax(running_days >= count[:, None], axis=1)
+        return np.where(count > 0, running_sum[np.arange(len(matrix)), idx], 0)
+    avg_first = sum_through(third) / third
+    avg_last = (totals - sum_through(n_days - third)) / third
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_rate = np.where(avg_first > 0, avg_last / avg_first, avg_last + 1)
+    mean_mentions = totals / np.maximum(n_days, 1)
+
+    # Heuristic classification. Fewer than 5 days of data only qualifies as active.
+    enough = n_days >= 5
+    emerging = enough & (growth_rate > 1.8) & (avg_last > 5) & is_active_recently
+    declining = enough & ~emerging & (growth_rate < 0.6) & (avg_first > 5)
+    peak = (enough & ~emerging & ~declining & (growth_rate >= 0.8) & (growth_rate <= 1.2)
+            & (mean_mentions > percentile_75) & is_active_recently)
+    active = (n_days > 0) & ~emerging & ~declining & ~peak & is_active_recently
+
+    topics = df['topic'].cat.categories
+    for c in np.flatnonzero(emerging):
+        results["emerging_topics"].append({"topic": topics[c], "growth_rate": float(np.round(growth_rate[c], 2)), "avg_mentions": float(np.round(mean_mentions[c], 1))})
+    for c in np.flatnonzero(declining):
+        results["declining_topics"].append({"topic": topics[c], "decline_rate": float(np.round(growth_rate[c], 2)), "avg_mentions": float(np.round(mean_mentions[c], 1))})
+    for c in np.flatnonzero(peak):
+        results["peak_topics"].append({"topic": topics[c], "avg_mentions": float(np.round(mean_mentions[c], 1))})
+    for c in np.flatnonzero(active):
+        results["active_topics"].append({"topic": topics[c], "last_mention_count": int(last_mentions[c])})
 
     # Build Trend Timeline for specific categories
     # Using the categories from the prompt
     categories = ["AI & Large Language Models", "Electric Vehicles", "Entertainment & Music", "Cricket"] # Corrected "Sports" to "Cricket" based on data
     timeline_series = defaultdict(list)
-    df_timeline = df_recent[df_recent['topic'].isin(categories)]
-    
-    # Ensure 'day' column exists and is timezone-aware or naive consistently
-    if not df_timeline.empty:
-         # Use dt accessor for timezone-aware or naive conversion
-         df_timeline['day_str'] = df_timeline['day'].dt.strftime('%Y-%m-%d')
-         timeline_counts = df_timeline.groupby(['topic', 'day_str']).size().reset_index(name='count')
+    codes = [c for c in (topic_code(datastore, t) for t in categories) if c >= 0]
 
+    if codes and matrix[codes].any():
          for topic in categories:
-             topic_data = timeline_counts[timeline_counts['topic'] == topic].sort_values('day_str')
-             for _, row in topic_data.iterrows():
-                 timeline_series[topic].append({"date": row['day_str'], "count": int(row['count'])})
+             c = topic_code(datastore, topic)
+             if c < 0:
+                 continue
+             active = np.flatnonzero(matrix[c])
+             for date, d in zip(cube.dates(active + first_day), active):
+                 timeline_series[topic].append({"date": date, "count": int(matrix[c, d])})
     else: # Handle case where none of the target categories are in recent data
          for topic in categories:
              timeline_series[topic] = []
@@ -333,80 +368,83 @@ def analyze_trends(datastore, days=90):
     return results
 
 
+@cached()
 def platform_comparison(datastore, topic, start=None, end=None):
     """Compares topic performance across platforms over time."""
-    df = datastore.df.copy()
+    df = datastore.df
 
     if df.empty:
         return {}
-        
+
+    cube = datastore.rollup
     if topic:
         # Case-insensitive topic filtering
-        df = df[df['topic'].str.lower() == topic.lower()]
+        codes = category_codes(df['topic'], topic, case_insensitive=True)
+    else:
+        codes = np.arange(cube.shape[0])
 
     # Convert start/end strings to datetime if provided (make them timezone-aware UTC)
     start_date = pd.to_datetime(start, utc=True, errors='coerce') if start else None
     end_date = pd.to_datetime(end, utc=True, errors='coerce') if end else None
+    if (start and pd.isna(start_date)) or (end and pd.isna(end_date)) or len(codes) == 0:
+        return {} # Unparseable bounds match nothing
+
+    # Half-open range [start_ns, end_ns); the end day is included in full
+    start_ns = start_date.value if start_date is not None else NAT_NS + 1
+    end_ns = (end_date + pd.Timedelta(days=1)).value if end_date is not None else np.iinfo(np.int64).max
+
+    # Whole days inside the range come straight from the cube, as [platform, day] arrays
+    first_ns = cube.first_day * NS_PER_DAY
+    full_lo = min(max(-(-(start_ns - first_ns) // NS_PER_DAY), 0), cube.n_days)
+    full_hi = max(min((end_ns - first_ns) // NS_PER_DAY, cube.n_days), full_lo)
+    days = slice(full_lo, full_hi)
+    counts = np.zeros((cube.n_platforms, cube.n_days), dtype=np.int64)
+    engagement = np.zeros_like(counts)
+    sentiment = np.zeros_like(counts)
+    counts[:, days] = cube.select('counts', topics=codes, days=days, by_platform=True)
+    for metric in ('likes', 'shares', 'comments'):
+        engagement[:, days] += cube.select(metric, topics=codes, days=days, by_platform=True)
+    sentiment[:, days] = cube.select('sentiment', topics=codes, days=days, by_platform=True)
+
+    # Bounds that fall inside a day: add those partial days from the topic index rows
+    full_lo_ns, full_hi_ns = first_ns + full_lo * NS_PER_DAY, first_ns + full_hi * NS_PER_DAY
+    partial = [(start_ns, min(full_lo_ns, end_ns))] if full_lo < full_hi else [(start_ns, end_ns)]
+    if full_lo < full_hi:
+        partial.append((full_hi_ns, end_ns))
+    for lo, hi in partial:
+        rows = datastore.topic_rows_between(codes, lo, hi)
+        if len(rows) == 0:
+            continue
+        day = datastore.day[rows] - cube.first_day
+        platform = df['platform'].cat.codes.to_numpy()[rows]
+        # Posts the cube left out (missing platform, or dated outside its day window) stay out here too
+        counted = (platform >= 0) & (day >= 0) & (day < cube.n_days)
+        rows, platform, day = rows[counted], platform[counted], day[counted]
+        # Engagement sum for this endpoint is likes + shares + comments
+        np.add.at(counts, (platform, day), 1)
+        np.add.at(engagement, (platform, day), df['likes'].to_numpy()[rows].astype(np.int64)
+                  + df['shares'].to_numpy()[rows] + df['comments'].to_numpy()[rows])
+        np.add.at(sentiment, (platform, day), datastore.sentiment_score[rows])
+
+    # Average sentiment score per day, rounded to 2 decimal places
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_sentiment = np.round(sentiment / counts, 2)
+
+    # Format for response, ensuring dates are strings; days come out sorted
+    results = {}
+    platforms = df['platform'].cat.categories
+    for p in range(len(platforms)):
+        active = np.flatnonzero(counts[p])
+        if len(active) == 0:
+            continue
+        results[platforms[p]] = records(
+            date=cube.dates(active),
+            mentions=counts[p, active],
+            engagement_sum=engagement[p, active],
+            avg_sentiment=avg_sentiment[p, active]
+        )
 
-    # Filter by date range (already timezone-aware)
-    if start_date:
-        df = df[df['timestamp'] >= start_date]
-    if end_date:
-        # Add one day to end_date to include the full end day
-        end_date_inclusive = end_date + pd.Timedelta(days=1)
-        df = df[df['timestamp'] < end_date_inclusive]
-
-    if df.empty:
-        return {}
-
-    df['day'] = df['timestamp'].dt.normalize() # Normalize to day (keeps timezone)
-
-    # Calculate engagement sum (using correct formula from prompt)
-    df['likes'] = pd.to_numeric(df['likes'], errors='coerce').fillna(0)
-    df['shares'] = pd.to_numeric(df['shares'], errors='coerce').fillna(0)
-    df['comments'] = pd.to_numeric(df['comments'], errors='coerce').fillna(0)
-    # Ensure correct formula: likes + 2*shares + 0.5*comments (This differs from platform_comparison prompt, using this one as requested elsewhere)
-    # The prompt for platform_comparison specifically asked for engagement_sum and avg_sentiment. Let's stick to sum = L+S+C for this endpoint.
-    df['engagement_sum'] = df['likes'] + df['shares'] + df['comments']
-
-
-    # Map sentiment to numerical values for averaging
-    sentiment_map = {'Positive': 1, 'Neutral': 0, 'Negative': -1}
-    df['sentiment_score'] = df['sentiment'].map(sentiment_map).fillna(0) # Fill NaN sentiments with Neutral (0)
-
-
-    # Group by platform and day
-    platform_daily = df.groupby(['platform', 'day']).agg(
-        total_mentions=('post_id', 'count'),
-        engagement_sum=('engagement_sum', 'sum'),
-        sentiment_score_sum=('sentiment_score', 'sum')
-    ).reset_index()
-
-    # Calculate average sentiment score
-    # Ensure division by zero doesn't occur if total_mentions is 0 (though groupby should handle this)
-    platform_daily['avg_sentiment_score'] = platform_daily.apply(
-        lambda row: row['sentiment_score_sum'] / row['total_mentions'] if row['total_mentions'] > 0 else 0,
-        axis=1
-    )
-    # Returning the numeric score rounded to 2 decimal places
-    platform_daily['avg_sentiment'] = platform_daily['avg_sentiment_score'].round(2)
-
-    # Format for response, ensuring dates are strings
-    results = defaultdict(list)
-    for _, row in platform_daily.iterrows():
-        results[row['platform']].append({
-            'date': row['day'].strftime('%Y-%m-%d'),
-            'mentions': int(row['total_mentions']),
-            'engagement_sum': int(row['engagement_sum']), # Ensure integer
-            'avg_sentiment': float(row['avg_sentiment']) # Ensure float
-        })
-        
-    # Sort the time series data within each platform
-    for platform in results:
-        results[platform] = sorted(results[platform], key=lambda x: x['date'])
-
-
-    return dict(results) # Convert back to dict for JSON
+    return results
 
 
 # --- Pattern Mining ---
@@ -415,7 +453,8 @@ def extract_phrases(text, ngram_range=(2, 3)):
     """Extracts n-gram phrases from text, removing stopwords."""
     if not isinstance(text, str):
         return set()
-    words = [w for w in re.findall(r"\b\w+\b", text.lower()) if w not in STOPWORDS and len(w) > 1] # Ensure words have length > 1
+    stop = stopwords()
+    words = [w for w in re.findall(r"\b\w+\b", text.lower()) if w not in stop and len(w) > 1] # Ensure words have length > 1
     phrases = set()
     for n in range(ngram_range[0], ngram_range[1] + 1):
         for i in range(len(words) - n + 1):
@@ -430,110 +469,421 @@ def extract_phrases(text, ngram_range=(2, 3)):
     #     phrases.add(cw.lower())
     return phrases
 
-@lru_cache()
+# Posts per phrase-extraction task, and the corpus size below which starting a
+# process pool costs more than it saves
+PHRASE_CHUNK_SIZE = 5000
+PARALLEL_MIN_POSTS = 20000
+
+# Phrases of every post in one snapshot. Post row r owns phrase ids
+# post_phrases[post_offsets[r]:post_offsets[r + 1]] into vocab; the transposed
+# posting list gives phrase id p the ascending rows
+# phrase_rows[phrase_offsets[p]:phrase_offsets[p + 1]]. topic_phrase_counts maps
+# (topic code, phrase) to the number of posts, in the order the pairs were first seen.
+PhraseIndex = namedtuple('PhraseIndex', ['vocab', 'post_offsets', 'post_phrases', 'phrase_offsets', 'phrase_rows',
+                                         'topic_phrase_counts'])
+
+
+def _extract_chunk(texts, topic_codes):
+    """Extracts the phrases of a chunk of posts; runs in a worker process."""
+    phrases = []
+    counts = Counter()
+    for text, code in zip(texts, topic_codes):
+        found = sorted(extract_phrases(text)) # Sorted so results don't depend on set order
+        phrases.append(found)
+        counts.update((code, p) for p in found)
+    return phrases, counts
+
+
+def _extract_posts(texts, codes):
+    """Extracts the phrases of many posts, in parallel chunks when that pays off.
+
+    Returns the per-post phrase lists and the topic/phrase counts.
+    """
+    chunks = [
+        (texts[i:i + PHRASE_CHUNK_SIZE], codes[i:i + PHRASE_CHUNK_SIZE])
+        for i in range(0, len(texts), PHRASE_CHUNK_SIZE)
+    ]
+
+    workers = os.cpu_count() or 1
+    if workers > 1 and len(texts) >= PARALLEL_MIN_POSTS:
+        # Imported here so workers that never build a large index skip multiprocessing
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Tokenizing is pure-Python CPU work, so threads would serialize on the GIL.
+        # The server is multi-threaded by now, and forking it could copy a lock some
+        # other thread holds; workers start from the clean forkserver process instead
+        context = multiprocessing.get_context('forkserver')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            parts = list(pool.map(_extract_chunk, *zip(*chunks)))
+    else:
+        parts = [_extract_chunk(*chunk) for chunk in chunks]
+
+    # Merge chunk results in order so first-seen order matches a serial pass
+    per_post = []
+    topic_phrase_counts = Counter()
+    for phrases, counts in parts:
+        per_post.extend(phrases)
+        topic_phrase_counts.update(counts)
+    return per_post, topic_phrase_counts
+
+
+def _post_texts(df):
+    """The text phrases are extracted from, one string per post."""
+    # Combine content and hashtags for phrase extraction
+    return (df['content'].astype(str) + ' ' + df['hashtags'].astype(str)).tolist()
+
+
+def _encode_lists(per_post, vocab=None):
+    """Encodes per-post lists of strings as (vocab, CSR offsets, int32 ids).
+
+    Ids index vocab; strings missing from a given vocab are appended to it.
+    """
+    lengths = np.fromiter((len(p) for p in per_post), dtype=np.int64, count=len(per_post))
+    ids, found = pd.factorize(np.array(list(itertools.chain.from_iterable(per_post)), dtype=object))
+    found = pd.Index(found)
+    if vocab is None:
+        vocab = found
+    else:
+        vocab = vocab.append(found.difference(vocab, sort=False))
+        ids = vocab.get_indexer(found)[ids]
+    offsets = np.zeros(len(per_post) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return vocab, offsets, ids.astype(np.int32)
+
+
+def _appended_lists(vocab, offsets, ids, per_post, delta):
+    """Adds the lists of appended posts to CSR-encoded per-post lists and reorders them into the new row order.
+
+    The vocab is renumbered in order of first appearance, so the result is
+    the same as encoding every post from scratch.
+    """
+    vocab, new_offsets, new_ids = _encode_lists(per_post, vocab)
+    offsets = np.concatenate([offsets, offsets[-1] + new_offsets[1:]])
+    offsets, ids = delta.reorder_lists(offsets, np.concatenate([ids, new_ids]))
+
+    present, first = np.unique(ids, return_index=True)
+    order = np.concatenate([present[np.argsort(first)], np.setdiff1d(np.arange(len(vocab)), present)])
+    rank = np.empty(len(vocab), dtype=np.int32)
+    rank[order] = np.arange(len(vocab))
+    return vocab[order], offsets, rank[ids]
+
+
+def _topic_phrase_counts(codes, vocab, post_offsets, post_phrases):
+    """Counts the posts of each (topic code, phrase) pair, in the order the pairs first appear."""
+    if len(vocab) == 0:
+        return Counter()
+    # Posts without a topic have code -1, hence the shift
+    keys = (np.repeat(codes.astype(np.int64) + 1, np.diff(post_offsets)) * len(vocab) + post_phrases)
+    pairs, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    by_first = np.argsort(first)
+    pairs, counts = pairs[by_first], counts[by_first]
+    keys = zip((pairs // len(vocab) - 1).tolist(), vocab[pairs % len(vocab)].tolist())
+    return Counter(dict(zip(keys, counts.tolist())))
+
+
+def _phrase_index_from(vocab, post_offsets, post_phrases, topic_phrase_counts):
+    """Completes a PhraseIndex with the transposed phrase -> rows posting lists."""
+    # The stable sort keeps each phrase's rows ascending
+    order = np.argsort(post_phrases, kind='stable')
+    phrase_rows = np.repeat(np.arange(len(post_offsets) - 1, dtype=np.int64), np.diff(post_offsets))[order]
+    phrase_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_phrases, minlength=len(vocab)), out=phrase_offsets[1:])
+    return PhraseIndex(vocab, post_offsets, post_phrases, phrase_offsets, phrase_rows, topic_phrase_counts)
+
+
+def build_phrase_index(datastore):
+    """Tokenizes every post once, in parallel chunks, and indexes the resulting phrases."""
+    df = datastore.df
+    per_post, topic_phrase_counts = _extract_posts(_post_texts(df), df['topic'].cat.codes.tolist())
+    vocab, post_offsets, post_phrases = _encode_lists(per_post)
+    return _phrase_index_from(vocab, post_offsets, post_phrases, topic_phrase_counts)
+
+
+def extend_phrase_index(index, datastore, delta):
+    """Carries a phrase index over to a snapshot built by appending posts, tokenizing only those."""
+    new = datastore.df.take(delta.new_rows)
+    per_post, _ = _extract_posts(_post_texts(new), new['topic'].cat.codes.tolist())
+    vocab, post_offsets, post_phrases = _appended_lists(index.vocab, index.post_offsets, index.post_phrases,
+                                                        per_post, delta)
+    # Recounted from the lists with numpy, which keeps the pairs in first-seen row order
+    codes = datastore.df['topic'].cat.codes.to_numpy()
+    return _phrase_index_from(vocab, post_offsets, post_phrases,
+                              _topic_phrase_counts(codes, vocab, post_offsets, post_phrases))
+
+
+def phrase_index(datastore):
+    """The snapshot's phrase index, built on first use and then shared by every caller."""
+    return datastore.derived('phrase_index', build_phrase_index, extend_phrase_index)
+
+
+@offloaded(limit=2)
+@cached()
 def pattern_rules(datastore, limit=50, min_cooccurrence=3):
     """Identifies topic-phrase co-occurrence rules."""
-    df = datastore.df.copy()
+    df = datastore.df
     if df.empty:
         return []
 
-    # Candidate phrase extraction
-    phrase_counts = Counter()
-    topic_phrase_map = defaultdict(Counter)
-    post_phrases = {} # Map post_id to its set of phrases
-
-    # Ensure text columns are strings before processing
-    df['content'] = df['content'].astype(str)
-    df['hashtags'] = df['hashtags'].astype(str)
-    df['topic'] = df['topic'].astype(str)
-
-
-    for _, row in df.iterrows():
-        # Combine content and hashtags for phrase extraction
-        text = row['content'] + ' ' + row['hashtags']
-        phrases = extract_phrases(text)
-        post_id = row['post_id']
-        post_phrases[post_id] = phrases
-        topic = row['topic']
-        for p in phrases:
-            phrase_counts[p] += 1
-            topic_phrase_map[topic][p] += 1
-
-    # Build co-occurrence of topic-phrase pairs
+    index = phrase_index(datastore)
+    codes = df['topic'].cat.codes.to_numpy()
+    topics = df['topic'].cat.categories
+    post_id_col = df['post_id'].to_numpy()
+    content_col = df['content'].to_numpy()
+
+    # Rules are ordered by co-occurrence count, then by the topic's first appearance,
+    # then by the phrase's first appearance within the topic
+    topic_rank = {c: i for i, c in enumerate(pd.unique(codes).tolist())}
+    candidates = [
+        (count, topic_rank[code], seen, code, phrase)
+        for seen, ((code, phrase), count) in enumerate(index.topic_phrase_counts.items())
+        if count >= min_cooccurrence
+    ]
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    # Only the rules that are returned need examples
     rules = []
-    for topic, phrase_counter in topic_phrase_map.items():
-        # Iterate through phrases for the current topic, ordered by frequency
-        for phrase, count in phrase_counter.most_common(): # Get all phrases, sort later
-            if count < min_cooccurrence:
-                continue
-
-            # Find example posts (limit to 3 examples)
-            examples = []
-            # Iterate through post_ids associated with the current topic first for efficiency
-            topic_post_ids = df[df['topic'] == topic]['post_id'].tolist()
-            
-            posts_checked = 0
-            # Prioritize posts belonging to the rule's topic
-            for post_id in topic_post_ids:
-                 if post_id in post_phrases and phrase in post_phrases[post_id]:
-                     row_data = df[df['post_id'] == post_id].iloc[0] # Get the first row matching post_id
-                     examples.append({
-                         'post_id': int(row_data['post_id']),
-                         'content': row_data['content'][:200] + ('...' if len(row_data['content']) > 200 else '') # Truncate content
-                     })
-                     if len(examples) >= 3:
-                         break
-                 posts_checked += 1
-                 # Optional: Limit search space for performance if dataset is very large
-                 # if posts_checked > 1000: break 
-            
-            # If fewer than 3 examples found in topic posts, search remaining posts (optional)
-            # This might be slow on large datasets and less relevant to the "topic-phrase" rule concept
-            # if len(examples) < 3:
-            #    # ... logic to search other posts ...
-
-
-            # Format the rule string as specified in the prompt
-            rule_str = f"{topic} often appears with phrase '{phrase}'"
-
-            rules.append({
-                'rule': rule_str,
-                'cooccurrence_count': int(count),
-                'examples': examples
+    for count, _, _, code, phrase in candidates[:limit]:
+        # Example posts (limit to 3): the first posts of the rule's topic that contain
+        # the phrase, read straight off the phrase's posting list
+        phrase_id = index.vocab.get_loc(phrase)
+        rows = index.phrase_rows[index.phrase_offsets[phrase_id]:index.phrase_offsets[phrase_id + 1]]
+        post_ids = post_id_col[rows[codes[rows] == code][:3]]
+        examples = []
+        for row in datastore.post_rows(post_ids):
+            content = content_col[row]
+            examples.append({
+                'post_id': int(post_id_col[row]),
+                'content': content[:200] + ('...' if len(content) > 200 else '') # Truncate content
             })
 
-    # Sort rules by co-occurrence count descending and take the limit
-    rules.sort(key=lambda x: x['cooccurrence_count'], reverse=True)
+        # Format the rule string as specified in the prompt
+        rule_str = f"{topics[code]} often appears with phrase '{phrase}'"
+
+        rules.append({
+            'rule': rule_str,
+            'cooccurrence_count': int(count),
+            'examples': examples
+        })
+
+    return rules
+
+# Item kinds association rules can be mined over
+RULE_ITEM_KINDS = ('topic', 'hashtag', 'platform', 'region', 'phrase')
+# Upper bound on enumerated itemsets, which bounds rule mining memory and time
+MAX_ITEMSETS = 200000
+
+# Hashtags of every post in one snapshot: post row r owns tag ids
+# post_tags[post_offsets[r]:post_offsets[r + 1]] into vocab
+HashtagIndex = namedtuple('HashtagIndex', ['vocab', 'post_offsets', 'post_tags'])
+
+
+def _post_tags(hashtags):
+    """Splits comma-separated hashtag strings into per-post lists of distinct tags."""
+    return [
+        list(dict.fromkeys(t.strip() for t in tags.split(',') if t.strip())) if isinstance(tags, str) else []
+        for tags in hashtags.tolist()
+    ]
+
+
+def build_hashtag_index(datastore):
+    """Splits every post's comma-separated hashtags once and indexes them."""
+    return HashtagIndex(*_encode_lists(_post_tags(datastore.df['hashtags'])))
+
+
+def extend_hashtag_index(index, datastore, delta):
+    """Carries a hashtag index over to a snapshot built by appending posts, splitting only theirs."""
+    per_post = _post_tags(datastore.df['hashtags'].take(delta.new_rows))
+    return HashtagIndex(*_appended_lists(index.vocab, index.post_offsets, index.post_tags, per_post, delta))
+
+
+def hashtag_index(datastore):
+    """The snapshot's hashtag index, built on first use and then shared by every caller."""
+    return datastore.derived('hashtag_index', build_hashtag_index, extend_hashtag_index)
+
+
+def _rule_item_postings(datastore, kinds):
+    """Encodes posts as (row, item id) posting pairs; each kind gets its own id range."""
+    df = datastore.df
+    rows = np.arange(len(df), dtype=np.int64)
+    postings = []
+    labels = []
+    for kind in kinds:
+        if kind in ('topic', 'platform', 'region'):
+            codes = df[kind].cat.codes.to_numpy()
+            known = codes >= 0
+            kind_rows, ids, vocab = rows[known], codes[known], df[kind].cat.categories
+        elif kind == 'hashtag':
+            index = hashtag_index(datastore)
+            kind_rows, ids, vocab = np.repeat(rows, np.diff(index.post_offsets)), index.post_tags, index.vocab
+        else:
+            index = phrase_index(datastore)
+            kind_rows, ids, vocab = np.repeat(rows, np.diff(index.post_offsets)), index.post_phrases, index.vocab
+        postings.append((kind_rows, ids.astype(np.int64) + len(labels)))
+        labels.extend({'type': kind, 'value': str(v)} for v in vocab)
+    return postings, labels
+
+
+# Mining holds large bitsets; one at a time keeps peak memory in check
+@offloaded(limit=1)
+@cached()
+def association_rules(datastore, min_support=0.01, min_confidence=0.5, min_lift=1.0, max_len=3,
+                      kinds=RULE_ITEM_KINDS, limit=50):
+    """Mines association rules between topics, hashtags, platforms, regions and phrases.
+
+    Each post is one transaction. min_support is the fraction of posts an
+    itemset must appear in; rules are ranked by lift, then confidence.
+    """
+    df = datastore.df
+    if df.empty:
+        return []
+
+    n = len(df)
+    min_count = max(1, math.ceil(min_support * n))
+    with stage('rules_itemsets'):
+        postings, labels = _rule_item_postings(datastore, kinds)
+        items, bits, supports = pack_transactions(postings, n, min_count)
+        itemsets = frequent_itemsets(items, bits, supports, min_count, max_len=max_len, max_itemsets=MAX_ITEMSETS)
+    if len(itemsets) >= MAX_ITEMSETS:
+        print(f"Rule mining stopped after {MAX_ITEMSETS} itemsets; raise min_support for complete results")
+
+    # Only the best rules are kept; item ids break ties so the order is stable across runs
+    with stage('rules_rank'):
+        found = heapq.nsmallest(
+            limit, rules_from_itemsets(itemsets, n, min_confidence=min_confidence, min_lift=min_lift),
+            key=lambda r: (-r[4], -r[3], -r[2], r[0], r[1])
+        )
+
+    rules = []
+    for antecedent, consequent, support, confidence, lift in found:
+        lhs = [labels[i] for i in sorted(antecedent)]
+        rhs = [labels[i] for i in sorted(consequent)]
+        rules.append({
+            'rule': ' & '.join(f"{x['type']}={x['value']}" for x in lhs) + ' => ' +
+                    ' & '.join(f"{x['type']}={x['value']}" for x in rhs),
+            'antecedent': lhs,
+            'consequent': rhs,
+            'count': int(round(support * n)),
+            'support': round(support, 4),
+            'confidence': round(confidence, 4),
+            'lift': round(lift, 4)
+        })
+    return rules
+
+# Topic/hashtag co-occurrence network of one snapshot. Entity e is labels[e] (a
+# topic name or '#tag') of type kinds[e], found in sizes[e] posts. The edges are
+# the non-zero off-diagonal entries of (post x entity incidence)^T (post x entity
+# incidence), stored once per pair as source < target and sorted by descending
+# weight; entity e's edges, heaviest first, are
+# edge_ids[neighbor_offsets[e]:neighbor_offsets[e + 1]].
+CooccurrenceGraph = namedtuple('CooccurrenceGraph', ['labels', 'kinds', 'sizes', 'lookup', 'sources', 'targets',
+                                                     'weights', 'neighbor_offsets', 'edge_ids'])
+
+
+def build_cooccurrence_graph(datastore):
+    """Counts how often every pair of topics/hashtags shares a post."""
+    df = datastore.df
+    topics = df['topic'].cat.categories
+    tags = hashtag_index(datastore)
+    labels = [str(t) for t in topics] + [str(t) for t in tags.vocab]
+    kinds = ['topic'] * len(topics) + ['hashtag'] * len(tags.vocab)
+    n_entities = len(labels)
+
+    # Sparse incidence matrix in COO form, grouped by post
+    codes = df['topic'].cat.codes.to_numpy()
+    topic_rows = np.flatnonzero(codes >= 0)
+    rows = np.concatenate([topic_rows, np.repeat(np.arange(len(df)), np.diff(tags.post_offsets))])
+    ids = np.concatenate([codes[topic_rows].astype(np.int64), tags.post_tags.astype(np.int64) + len(topics)])
+    order = np.argsort(rows, kind='stable')
+    rows, ids = rows[order], ids[order]
+
+    # The product's off-diagonal entries: pair each entity with the ones k places
+    # later in the same post, for every k some post is long enough for
+    pair_keys = []
+    for k in itertools.count(1):
+        same_post = rows[:-k] == rows[k:]
+        if not same_post.any():
+            break
+        a, b = ids[:-k][same_post], ids[k:][same_post]
+        pair_keys.append(np.minimum(a, b) * n_entities + np.maximum(a, b))
+    keys, weights = np.unique(np.concatenate(pair_keys or [np.empty(0, dtype=np.int64)]), return_counts=True)
+    sources, targets = keys // n_entities, keys % n_entities
+    by_weight = np.lexsort((targets, sources, -weights))
+    sources, targets, weights = sources[by_weight], targets[by_weight], weights[by_weight]
+
+    # Per-entity adjacency; edge ids are already heaviest first, and the stable sort keeps that
+    endpoints = np.concatenate([sources, targets])
+    edge_ids = np.tile(np.arange(len(weights)), 2)[np.argsort(endpoints, kind='stable')]
+    neighbor_offsets = np.zeros(n_entities + 1, dtype=np.int64)
+    np.cumsum(np.bincount(endpoints, minlength=n_entities), out=neighbor_offsets[1:])
+
+    lookup = {}
+    for e, label in enumerate(labels):
+        lookup.setdefault(label, e)
+    return CooccurrenceGraph(labels, kinds, np.bincount(ids, minlength=n_entities), lookup, sources, targets,
+                             weights, neighbor_offsets, edge_ids)
+
+
+def cooccurrence_graph(datastore):
+    """The snapshot's co-occurrence network, built on first use and then shared by every caller."""
+    return datastore.derived('cooccurrence_graph', build_cooccurrence_graph)
+
+
+def build_indexes(datastore):
+    """Builds every derived index of a snapshot up front, e.g. before other processes map it."""
+    phrase_index(datastore)
+    cooccurrence_graph(datastore) # Builds the hashtag index too
+    datastore.post_rows([]) # Builds the post_id lookup
+
+
+@offloaded(limit=2)
+@cached()
+def graph_view(datastore, min_weight=2, top_n_edges=100, node=None):
+    """Heaviest co-occurrence edges of the whole network, or of one node's ego graph.
+
+    Returns None when node isn't a known topic or hashtag.
+    """
+    graph = cooccurrence_graph(datastore)
+    if node is None:
+        edges = np.arange(len(graph.weights))
+        # Every topic is shown, linked or not, followed by the linked hashtags
+        entities = [graph.lookup[t] for t in datastore.topics]
+    else:
+        center = graph.lookup.get(node)
+        if center is None:
+            return None
+        edges = graph.edge_ids[graph.neighbor_offsets[center]:graph.neighbor_offsets[center + 1]]
+        entities = [center]
 
-    return rules[:limit]
+    # Edges are heaviest first, so the ones above min_weight are a prefix
+    edges = edges[:np.searchsorted(-graph.weights[edges], -min_weight, side='right')][:max(top_n_edges, 0)]
+    for e in itertools.chain.from_iterable(zip(graph.sources[edges].tolist(), graph.targets[edges].tolist())):
+        entities.append(e)
+
+    return {
+        'nodes': [
+            {'id': graph.labels[e], 'label': graph.labels[e], 'type': graph.kinds[e], 'size': int(graph.sizes[e])}
+            for e in dict.fromkeys(entities)
+        ],
+        'edges': [
+            {'source': graph.labels[a], 'target': graph.labels[b], 'weight': int(w)}
+            for a, b, w in zip(graph.sources[edges].tolist(), graph.targets[edges].tolist(), graph.weights[edges].tolist())
+        ]
+    }
 
 # --- Topic Explorer ---
 
+def topic_code(datastore, topic):
+    """Category code of a topic in the snapshot, or -1 if it is unknown."""
+    return int(datastore.df['topic'].cat.categories.get_indexer([topic])[0])
+
+
+@cached()
 def topic_time_series(datastore, topic):
     """Generates a daily time series of mention counts for a specific topic."""
-    df = datastore.df.copy()
-    if df.empty or topic not in datastore.topics:
+    if datastore.df.empty or topic not in datastore.topics:
         return []
 
-    topic_df = df[df['topic'] == topic].copy()
-    if topic_df.empty:
-         return []
-
-    # Ensure timestamp is datetime and normalize to day
-    topic_df['day'] = pd.to_datetime(topic_df['timestamp']).dt.normalize()
-    
-    # Count mentions per day
-    time_series = topic_df.groupby('day').size().reset_index(name='count')
-    
-    # Format for JSON response
-    series_data = []
-    for _, row in time_series.iterrows():
-        series_data.append({
-            'date': row['day'].strftime('%Y-%m-%d'),
-            'count': int(row['count'])
-        })
-        
-    # Sort by date
-    series_data.sort(key=lambda x: x['date'])
-
-    return series_data
\ No newline at end of file
+    # Count mentions per day from the rollup cube (days come out in date order)
+    counts = datastore.rollup.select('counts', topics=[topic_code(datastore, topic)])
+    days = np.flatnonzero(counts)
+    return records(date=datastore.rollup.dates(days), count=counts[days])
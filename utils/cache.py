@@ -0,0 +1,156 @@
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import profiling, stage
+from utils.offload import SingleFlight
+
+
+def estimate_size(value, _depth=0):
+    """Roughly estimates the bytes held by a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=False))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if _depth > 4: # Deeply nested payloads are rare; don't walk them forever
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _depth + 1) for v in value)
+    return size
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by entry count and estimated bytes, with optional TTLs."""
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count_miss=True):
+        """Returns (True, value) on a fresh hit, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Stores a value, evicting least recently used entries to stay within bounds."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # Never worth evicting everything for a single result, but say so:
+            # an uncacheable result is recomputed by every request that needs it
+            print(f"Not caching a {size / 2**20:.1f} MiB result over the {self.max_bytes / 2**20:.0f} MiB limit: {key[:2]}")
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+
+# Shared by every analytics function; results for old snapshot versions age out via LRU
+RESULT_CACHE = ResultCache()
+
+
+def cached(ttl=None, cache=None):
+    """Caches a function of (snapshot, ...) keyed on its arguments and the snapshot version.
+
+    Pass ttl (seconds) for results that depend on the wall clock, such as
+    "active in the last N days", so they are recomputed even without a refresh.
+    Cached values are shared between requests and must be treated as read-only.
+    Concurrent misses on the same key compute the value once and share it.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        flights = SingleFlight()
+
+        def key_for(datastore, args, kwargs):
+            # Normalize positional/keyword/default arguments into one key
+            bound = signature.bind(datastore, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(list(bound.arguments.items())[1:])
+            return (func.__module__, func.__qualname__, datastore.version, params)
+
+        def compute(store, key, datastore, args, kwargs):
+            with stage(func.__name__):
+                value = func(datastore, *args, **kwargs)
+            store.put(key, value, ttl=ttl)
+            return value
+
+        @wraps(func)
+        def wrapper(datastore, *args, **kwargs):
+            if profiling(): # Profiles show the computation, not a cache hit
+                return func(datastore, *args, **kwargs)
+            store = cache if cache is not None else RESULT_CACHE
+            key = key_for(datastore, args, kwargs)
+            try:
+                hit, value = store.get(key)
+            except TypeError: # Unhashable arguments are simply not cached
+                return func(datastore, *args, **kwargs)
+            if hit:
+                return value
+            return flights.run(key, lambda: compute(store, key, datastore, args, kwargs))
+
+        def peek(datastore, *args, **kwargs):
+            """Returns (True, value) if the result is cached, without computing it or counting a miss."""
+            store = cache if cache is not None else RESULT_CACHE
+            try:
+                return store.get(key_for(datastore, args, kwargs), count_miss=False)
+            except TypeError:
+                return False, None
+
+        wrapper.uncached = func
+        wrapper.peek = peek
+        return wrapper
+    return decorator
@@ -0,0 +1,389 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever the on-disk layout changes so stale caches are rebuilt
+CACHE_FORMAT = 2
+MANIFEST = 'manifest.json'
+# Bytes hashed from the head and tail of the source file for the fingerprint
+FINGERPRINT_BLOCK = 1 << 20
+# Rows gathered at a time when laying spooled columns out in their final order
+BLOCK_ROWS = 1 << 17
+TEXT_GATHER_ROWS = 1 << 13
+
+
+def cache_path_for(csv_path):
+    """Returns the snapshot directory that sits next to a CSV file."""
+    return csv_path + '.colcache'
+
+
+def source_fingerprint(csv_path):
+    """Fingerprints a source file by size, mtime and a digest of its head and tail."""
+    st = os.stat(csv_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(csv_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if st.st_size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, st.st_size - FINGERPRINT_BLOCK))
+            digest.update(f.read())
+    return {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'digest': digest.hexdigest(),
+    }
+
+
+def _write_text(values, base):
+    """Stores a string column as one UTF-8 blob plus character offsets."""
+    nulls = values.isna().to_numpy()
+    if nulls.any():
+        nulls.tofile(base + '.nulls')
+    values = values.where(~nulls, '').astype(str)
+    lengths = values.str.len().to_numpy(dtype=np.int64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    offsets.tofile(base + '.offsets')
+    with open(base + '.data', 'wb') as f:
+        f.write(''.join(values.tolist()).encode('utf-8'))
+
+
+def _read_text(base, length):
+    """Rebuilds a string column written by _write_text."""
+    offsets = np.fromfile(base + '.offsets', dtype=np.int64)
+    with open(base + '.data', 'rb') as f:
+        blob = f.read().decode('utf-8')
+    if len(offsets) != length + 1:
+        raise ValueError(f"Corrupt text column {base}")
+    bounds = offsets.tolist()
+    values = pd.Series([blob[a:b] for a, b in zip(bounds[:-1], bounds[1:])], dtype=str)
+    if os.path.exists(base + '.nulls'):
+        values = values.mask(np.fromfile(base + '.nulls', dtype=bool))
+    return values
+
+
+def _column_kind(col):
+    """How a column is stored: 'category', 'timestamp', 'numeric' or 'text'."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return 'category'
+    if isinstance(col.dtype, pd.DatetimeTZDtype):
+        return 'timestamp'
+    if pd.api.types.is_numeric_dtype(col.dtype) and not pd.api.types.is_bool_dtype(col.dtype):
+        return 'numeric'
+    return 'text'
+
+
+def write_column_cache(df, cache_dir, fingerprint):
+    """Writes the frame as a typed columnar snapshot keyed by the source fingerprint."""
+    tmp_dir = cache_dir + f'.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        base = os.path.join(tmp_dir, f'c{i}')
+        kind = _column_kind(col)
+        if kind == 'category':
+            # Integer codes are memory-mapped; the dictionary is stored as text
+            raw = col.cat.codes.to_numpy()
+            raw.tofile(base + '.bin')
+            _write_text(col.cat.categories.to_series(), base + '.categories')
+            columns.append({'name': name, 'kind': 'category', 'dtype': raw.dtype.str, 'categories': len(col.cat.categories)})
+        elif kind == 'timestamp':
+            # Keep the raw integer ticks; NaT survives as the int64 sentinel
+            raw = col.dt.tz_convert(None).to_numpy()
+            raw.tofile(base + '.bin')
+            columns.append({'name': name, 'kind': 'timestamp', 'dtype': raw.dtype.str, 'tz': str(col.dt.tz)})
+        elif kind == 'numeric':
+            raw = col.to_numpy()
+            raw.tofile(base + '.bin')
+            columns.append({'name': name, 'kind': 'numeric', 'dtype': raw.dtype.str})
+        else:
+            _write_text(col, base)
+            columns.append({'name': name, 'kind': 'text'})
+
+    _publish(tmp_dir, cache_dir, fingerprint, len(df), columns)
+
+
+def _publish(tmp_dir, cache_dir, fingerprint, rows, columns):
+    """Writes the manifest and moves a finished snapshot directory into place."""
+    manifest = {
+        'format': CACHE_FORMAT,
+        'source': fingerprint,
+        'rows': rows,
+        'columns': columns,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+    # Swap the finished directory into place so readers never see a partial snapshot
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def _missing_column(kind, length, tz=None):
+    """A column of missing values that is stored as the given kind."""
+    if kind == 'category':
+        return pd.Series(pd.Categorical([None] * length))
+    if kind == 'timestamp':
+        return pd.Series(pd.NaT, index=range(length), dtype=f'datetime64[ns, {tz}]')
+    if kind == 'numeric':
+        return pd.Series(np.nan, index=range(length))
+    return pd.Series([None] * length, dtype=object)
+
+
+class _Spool:
+    """On-disk buffers that frames are appended to chunk by chunk.
+
+    Fixed-width columns keep one .npy file per chunk, since a later chunk
+    may need a wider dtype; category columns are spooled as codes into one
+    dictionary shared by all chunks, in order of first appearance. Text is
+    spooled as UTF-8 bytes with byte offsets, so any row can be read back
+    without decoding the rest.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory)
+        self.columns = None
+        self.kinds = {}
+        self.rows = 0
+        self.parts = {}
+        self.dictionaries = {}
+        self.tz = {}
+        self._text = {}
+        self._fixed = {}
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, f'c{self.columns.index(name)}{suffix}')
+
+    def append(self, df):
+        """Spools one chunk; its columns must match the first chunk's."""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            for name in self.columns:
+                self.kinds[name] = _column_kind(df[name])
+                self.parts[name] = []
+                if self.kinds[name] == 'text':
+                    self._text[name] = [open(self._path(name, suffix), 'wb') for suffix in ('.blob', '.offsets', '.nulls')]
+                    np.zeros(1, dtype=np.int64).tofile(self._text[name][1])
+                elif self.kinds[name] == 'category':
+                    self.dictionaries[name] = {}
+                elif self.kinds[name] == 'timestamp':
+                    self.tz[name] = str(df[name].dt.tz)
+        elif list(df.columns) != self.columns:
+            raise ValueError("Chunks have different columns")
+
+        for name in self.columns:
+            col = df[name]
+            kind = _column_kind(col)
+            if kind != self.kinds[name]:
+                if not col.isna().all():
+                    raise ValueError(f"Column {name} changes type between chunks")
+                # An all-missing chunk just holds missing values of the column's kind
+                col = _missing_column(self.kinds[name], len(col), self.tz.get(name))
+            if self.kinds[name] == 'text':
+                self._append_text(name, col)
+                continue
+            if self.kinds[name] == 'category':
+                dictionary = self.dictionaries[name]
+                lookup = np.array([dictionary.setdefault(c, len(dictionary)) for c in col.cat.categories] + [-1],
+                                  dtype=np.int64)
+                raw = lookup[col.cat.codes.to_numpy()] # Missing codes (-1) hit the trailing -1
+            elif self.kinds[name] == 'timestamp':
+                raw = col.dt.tz_convert(None).to_numpy()
+            else:
+                raw = col.to_numpy()
+            path = self._path(name, f'.{len(self.parts[name])}.npy')
+            np.save(path, raw)
+            self.parts[name].append(path)
+        self.rows += len(df)
+
+    def _append_text(self, name, col):
+        blob, offsets, nulls = self._text[name]
+        missing = col.isna().to_numpy()
+        encoded = [v.encode('utf-8') for v in col.where(~missing, '').astype(str).tolist()]
+        ends = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))) + blob.tell()
+        blob.write(b''.join(encoded))
+        ends.tofile(offsets)
+        missing.tofile(nulls)
+
+    def close(self):
+        for handles in self._text.values():
+            for f in handles:
+                f.close()
+
+    def fixed(self, name):
+        """A fixed-width column as one memory-mapped array in the widest dtype any chunk used."""
+        if name not in self._fixed:
+            parts = [np.load(path, mmap_mode='r') for path in self.parts[name]]
+            dtype = np.result_type(*parts)
+            path = self._path(name, '.all')
+            with open(path, 'wb') as f:
+                for part in parts:
+                    part.astype(dtype).tofile(f)
+            self._fixed[name] = np.memmap(path, dtype=dtype, mode='r', shape=(self.rows,)) if self.rows else np.empty(0, dtype=dtype)
+        return self._fixed[name]
+
+    def categories(self, name):
+        """A category column's values seen in any chunk, sorted as astype('category') orders them."""
+        return pd.Index(list(self.dictionaries[name])).sort_values()
+
+    def series(self, name, categories):
+        """A whole category or timestamp column, read into memory."""
+        if self.kinds[name] == 'category':
+            return pd.Series(pd.Categorical.from_codes(self.codes(name, categories, self.fixed(name)), categories=categories))
+        return pd.Series(np.asarray(self.fixed(name))).dt.tz_localize(self.tz[name])
+
+    def codes(self, name, categories, spooled):
+        """Translates spooled dictionary codes into codes of the given categories."""
+        lookup = np.append(categories.get_indexer(pd.Index(list(self.dictionaries[name]))), -1)
+        return lookup[spooled]
+
+    def text(self, name, rows):
+        """Gathers text rows as (UTF-8 bytes, character lengths, missing mask)."""
+        path = self._path(name, '.blob')
+        blob = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.empty(0, dtype=np.uint8)
+        offsets = np.memmap(self._path(name, '.offsets'), dtype=np.int64, mode='r')
+        missing = np.memmap(self._path(name, '.nulls'), dtype=bool, mode='r')
+        starts = offsets[rows]
+        lengths = offsets[rows + 1] - starts
+        firsts = np.cumsum(lengths) - lengths
+
+        # Byte-wise gathers need an index per byte, so they go a few thousand rows at a time
+        pieces = []
+        for i in range(0, len(rows), TEXT_GATHER_ROWS):
+            part = slice(i, i + TEXT_GATHER_ROWS)
+            bytes_before = np.repeat(starts[part] - (firsts[part] - firsts[i]), lengths[part])
+            pieces.append(blob[bytes_before + np.arange(len(bytes_before))])
+        data = np.concatenate(pieces) if pieces else np.empty(0, dtype=np.uint8)
+
+        # UTF-8 continuation bytes look like 10xxxxxx; every other byte starts a character
+        char_lengths = np.zeros(len(rows), dtype=np.int64)
+        nonempty = lengths > 0
+        if nonempty.any():
+            lead = (data & 0xC0) != 0x80
+            char_lengths[nonempty] = np.add.reduceat(lead, firsts[nonempty], dtype=np.int64)
+        return data.tobytes(), char_lengths, np.asarray(missing[rows])
+
+
+def write_column_cache_chunked(chunks, cache_dir, fingerprint, layout=None, key_columns=()):
+    """Writes a columnar snapshot from an iterable of frames without holding them all in memory.
+
+    Chunks are spooled to disk as they arrive and then written out in blocks,
+    so peak memory is about one chunk plus a few bytes per row. Category
+    columns get sorted categories, as if the chunks had been concatenated and
+    converted with astype('category'). layout, when given, receives a frame
+    holding the whole key_columns and returns (keys, order) like
+    topic_partition: rows are written in that order (None keeps them as they
+    are) and category keys take the categories of the returned frame.
+    """
+    tmp_dir = cache_dir + f'.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    spool = _Spool(os.path.join(tmp_dir, 'spool'))
+    try:
+        for chunk in chunks:
+            spool.append(chunk)
+        spool.close()
+        if spool.columns is None:
+            raise ValueError("No chunks to write")
+
+        n = spool.rows
+        categories = {name: spool.categories(name) for name in spool.columns if spool.kinds[name] == 'category'}
+        order = None
+        if layout is not None:
+            keys = pd.DataFrame({name: spool.series(name, categories.get(name)) for name in key_columns})
+            keys, order = layout(keys)
+            for name in key_columns:
+                if name in categories:
+                    categories[name] = keys[name].cat.categories
+            del keys
+
+        columns = []
+        for i, name in enumerate(spool.columns):
+            base = os.path.join(tmp_dir, f'c{i}')
+            kind = spool.kinds[name]
+            blocks = (np.arange(s, min(s + BLOCK_ROWS, n)) if order is None else order[s:s + BLOCK_ROWS]
+                      for s in range(0, n, BLOCK_ROWS))
+            if kind == 'text':
+                _write_text_blocks(spool, name, blocks, base)
+                columns.append({'name': name, 'kind': 'text'})
+                continue
+
+            values = spool.fixed(name)
+            if kind == 'category':
+                dtype = pd.Categorical([], categories=categories[name]).codes.dtype
+            else:
+                dtype = values.dtype
+            with open(base + '.bin', 'wb') as f:
+                for rows in blocks:
+                    raw = values[rows]
+                    if kind == 'category':
+                        raw = spool.codes(name, categories[name], raw)
+                    raw.astype(dtype).tofile(f)
+            meta = {'name': name, 'kind': kind, 'dtype': np.dtype(dtype).str}
+            if kind == 'category':
+                _write_text(categories[name].to_series(), base + '.categories')
+                meta['categories'] = len(categories[name])
+            elif kind == 'timestamp':
+                meta['tz'] = spool.tz[name]
+            columns.append(meta)
+    except BaseException:
+        spool.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(spool.directory)
+    _publish(tmp_dir, cache_dir, fingerprint, n, columns)
+
+
+def _write_text_blocks(spool, name, blocks, base):
+    """Writes a spooled text column block by block in _write_text's format."""
+    any_missing = False
+    with open(base + '.data', 'wb') as data_file, open(base + '.offsets', 'wb') as offsets_file, \
+            open(base + '.nulls', 'wb') as nulls_file:
+        written = 0
+        np.zeros(1, dtype=np.int64).tofile(offsets_file)
+        for rows in blocks:
+            data, char_lengths, missing = spool.text(name, rows)
+            data_file.write(data)
+            (np.cumsum(char_lengths) + written).tofile(offsets_file)
+            written += int(char_lengths.sum())
+            missing.tofile(nulls_file)
+            any_missing |= bool(missing.any())
+    if not any_missing:
+        os.remove(base + '.nulls')
+
+
+def read_column_cache(cache_dir, fingerprint):
+    """Loads a columnar snapshot, or returns None if it is missing or stale."""
+    manifest_path = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != CACHE_FORMAT or manifest.get('source') != fingerprint:
+        return None
+
+    rows = manifest['rows']
+    data = {}
+    for i, meta in enumerate(manifest['columns']):
+        base = os.path.join(cache_dir, f'c{i}')
+        if meta['kind'] == 'text':
+            data[meta['name']] = _read_text(base, rows)
+            continue
+        # Fixed-width columns are memory-mapped rather than read into the heap
+        raw = np.memmap(base + '.bin', dtype=np.dtype(meta['dtype']), mode='r', shape=(rows,)) if rows else np.empty(0, dtype=np.dtype(meta['dtype']))
+        if meta['kind'] == 'category':
+            categories = _read_text(base + '.categories', meta['categories'])
+            data[meta['name']] = pd.Series(pd.Categorical.from_codes(raw, categories=pd.Index(categories)))
+        elif meta['kind'] == 'timestamp':
+            data[meta['name']] = pd.Series(raw).dt.tz_localize(meta['tz'])
+        else:
+            data[meta['name']] = pd.Series(raw, copy=False)
+    return pd.DataFrame(data, copy=False)
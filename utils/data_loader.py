@@ -1,25 +1,576 @@
 import pandas as pd
+import numpy as np
 from dateutil import parser
+import hashlib
+import io
 import os
-from collections import defaultdict
-from functools import lru_cache
 import schedule
 import time
 import threading
+import itertools
+import re
+from utils.column_cache import (cache_path_for, read_column_cache, source_fingerprint, write_column_cache,
+                                write_column_cache_chunked)
+from utils.metrics import record_build, stage
+from utils.rollup import NAT_DAY, NAT_NS, NS_PER_DAY, RollupCube
+
+# Low-cardinality string columns held as pandas Categoricals, so filters compare
+# small integer codes instead of Python strings
+CATEGORY_COLUMNS = ['platform', 'topic', 'sentiment', 'region', 'user']
+# Engagement counters, downcast to the smallest integer type that holds them
+COUNT_COLUMNS = ['likes', 'shares', 'comments']
+# Sentiment labels as numbers; anything else counts as Neutral
+SENTIMENT_SCORES = {'Positive': 1, 'Neutral': 0, 'Negative': -1}
+# Read size when hashing the CSV up to the ingestion watermark, which checks
+# that later changes only appended to it
+WATERMARK_BLOCK = 1 << 20
+# Rows parsed at a time when streaming the CSV into the column cache
+CSV_CHUNK_ROWS = 100000
+
+
+def apply_schema(df):
+    """Converts a freshly parsed frame to the compact in-memory schema."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            counts = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.int64)
+            df[col] = pd.to_numeric(counts, downcast='integer')
+    return df
+
+
+def category_codes(series, value, case_insensitive=False):
+    """Returns the category codes of a categorical column that match a value."""
+    categories = series.cat.categories
+    if case_insensitive:
+        value = str(value).lower()
+        return np.flatnonzero(categories.astype(str).str.lower() == value)
+    loc = categories.get_indexer([value])[0]
+    return np.array([loc]) if loc >= 0 else np.array([], dtype=np.intp)
+
+
+def category_mask(series, value, case_insensitive=False):
+    """Boolean row mask for a categorical column equal to value, computed on the codes."""
+    codes = category_codes(series, value, case_insensitive)
+    if len(codes) == 1:
+        return series.cat.codes.to_numpy() == codes[0]
+    return np.isin(series.cat.codes.to_numpy(), codes)
+
+
+def category_lookup(series, mapping, default=0):
+    """Maps a categorical column through a dict once per category rather than per row."""
+    table = np.array([mapping.get(c, default) for c in series.cat.categories] + [default])
+    # Missing values carry code -1, which lands on the trailing default
+    return table[series.cat.codes.to_numpy()]
+
+
+# Word tokens indexed for interest matching; same notion of a word as the \b regex boundary
+TOKEN_RE = re.compile(r'\w+')
+
+
+def timestamp_ns(series):
+    """A tz-aware timestamp column as int64 nanoseconds since the epoch (NaT is the int64 minimum)."""
+    return series.dt.tz_convert(None).to_numpy().astype('datetime64[ns]').view(np.int64)
+
+
+def topic_partition(df):
+    """Returns (df, order) such that df.take(order) is grouped by topic and time-sorted within each topic.
+
+    Topics are renumbered in order of first appearance, so the groups keep that
+    order; posts without a topic go last. order is None when the frame is
+    already laid out this way.
+    """
+    if df.empty:
+        return df, None
+    topic = df['topic']
+    codes = topic.cat.codes.to_numpy()
+    stamps = timestamp_ns(df['timestamp'])
+    n_topics = len(topic.cat.categories)
+    key = np.where(codes >= 0, codes, n_topics)
+    step = np.diff(key)
+    if (step >= 0).all() and ((step > 0) | (np.diff(stamps) >= 0)).all():
+        return df, None
+
+    first_seen = pd.unique(codes[codes >= 0])
+    unused = np.setdiff1d(np.arange(n_topics), first_seen)
+    topic = topic.cat.reorder_categories(topic.cat.categories[np.concatenate([first_seen, unused])])
+    codes = topic.cat.codes.to_numpy()
+    key = np.where(codes >= 0, codes, n_topics)
+
+    # Both sorts are stable and the second one radix-sorts the small codes
+    order = np.argsort(stamps, kind='stable')
+    order = order[np.argsort(key[order], kind='stable')]
+    return df.assign(topic=topic), order
+
+
+def partition_by_topic(df):
+    """Lays the posts out grouped by topic and sorted by timestamp within each topic.
+
+    See topic_partition. A frame that is already laid out this way (such as
+    one read back from the column cache) is returned as is.
+    """
+    df, order = topic_partition(df)
+    return df if order is None else df.take(order).reset_index(drop=True)
+
+
+def append_rows(df, rows):
+    """Concatenates newly parsed rows onto a frame without renumbering its categories.
+
+    Categories first seen in rows are added after the existing ones, in order
+    of appearance, so every code in df keeps its meaning.
+    """
+    if list(rows.columns) != list(df.columns):
+        raise ValueError("Appended rows have different columns")
+    df, rows = df.copy(deep=False), rows.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        known = df[col].cat.categories
+        codes = rows[col].cat.codes.to_numpy()
+        seen = rows[col].cat.categories[pd.unique(codes[codes >= 0])]
+        categories = known.append(seen.difference(known, sort=False))
+        df[col] = df[col].cat.set_categories(categories)
+        rows[col] = rows[col].cat.set_categories(categories)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def searchable_text(df):
+    """The lowercased text that interest matching runs against, one string per row."""
+    return (df['topic'].astype(str) + ' ' + df['content'].astype(str) + ' ' + df['hashtags'].astype(str)).str.lower()
+
+
+# Snapshot versions are unique for the whole process, so caches keyed on a
+# version can never confuse snapshots from different DataStores. They count up
+# from the process start time (in microseconds, as shared snapshots are
+# versioned), so ETags and cursors handed out before a restart never match a
+# snapshot built after it
+_snapshot_versions = itertools.count(time.time_ns() // 1000)
+
+
+class SnapshotDelta:
+    """Where the rows of a snapshot built by appending came from.
+
+    The combined rows are the previous snapshot's rows followed by the
+    appended ones in file order; combined row i becomes row positions[i] of
+    the new snapshot, whose row j is combined row order[j].
+    """
+
+    def __init__(self, order, n_previous):
+        self.order = order
+        self.n_previous = n_previous
+        self.positions = np.empty(len(order), dtype=np.int64)
+        self.positions[order] = np.arange(len(order))
+
+    @property
+    def keeps_order(self):
+        """Whether the previous rows kept their relative order (new rows were only inserted between them)."""
+        previous = self.positions[:self.n_previous]
+        return bool((previous[1:] > previous[:-1]).all())
+
+    @property
+    def new_rows(self):
+        """Rows of the new snapshot holding the appended posts, in file order."""
+        return self.positions[self.n_previous:]
+
+    def reorder_lists(self, offsets, values):
+        """Reorders per-row lists (CSR offsets and values over the combined rows) into the new row order."""
+        lengths = np.diff(offsets)[self.order]
+        new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        # Each list is copied whole from its old start to its new one
+        shift = np.repeat(offsets[:-1][self.order] - new_offsets[:-1], lengths)
+        return new_offsets, values[shift + np.arange(new_offsets[-1])]
+
+
+def _frame_state(df):
+    """Splits a frame into picklable columns, fixed-width ones as plain ndarrays.
+
+    Pickle protocol 5 hands plain ndarrays to the buffer callback instead of
+    copying them into the stream, so a snapshot published for other processes
+    maps its numeric, category code and timestamp columns rather than each
+    reader owning a copy. Text columns are pickled as they are.
+    """
+    columns = []
+    for name, col in df.items():
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            parts = (np.ascontiguousarray(col.array.codes), col.cat.categories, col.cat.ordered)
+            columns.append((name, 'category', parts))
+        elif isinstance(col.dtype, pd.DatetimeTZDtype):
+            # Stored as int64 ticks since the epoch, which astype() reads back without a copy
+            columns.append((name, 'timestamp', (np.ascontiguousarray(col.array.asi8), col.dtype)))
+        elif isinstance(col.dtype, np.dtype) and col.dtype.kind in 'biuf':
+            columns.append((name, 'numeric', np.ascontiguousarray(col.to_numpy())))
+        else:
+            columns.append((name, 'other', col))
+    return {'index': df.index, 'columns': columns}
+
+
+def _frame_from_state(state):
+    """Rebuilds a frame from _frame_state over the unpickled buffers, without copying them."""
+    data = {}
+    for name, kind, parts in state['columns']:
+        if kind == 'category':
+            codes, categories, ordered = parts
+            data[name] = pd.Categorical.from_codes(codes, categories=categories, ordered=ordered, validate=False)
+        elif kind == 'timestamp':
+            ticks, dtype = parts
+            data[name] = pd.Series(ticks, index=state['index'], copy=False).astype(dtype)
+        else:
+            data[name] = parts
+    return pd.DataFrame(data, index=state['index'], copy=False)
+
+
+class Snapshot:
+    """An immutable, fully built view of the posts and everything derived from them.
+
+    Snapshots are never modified after construction. DataStore publishes a new one on
+    refresh, and each request pins the snapshot it started with.
+    """
+
+    def __init__(self, df, source=None, rollup_regions=False, base=None):
+        # Each topic's posts are one contiguous, time-sorted run of rows
+        self.df = partition_by_topic(df)
+        self.version = next(_snapshot_versions)
+        self.source = source
+        self.rollup_regions = rollup_regions
+        self.built_at = pd.Timestamp.utcnow()
+        # Structures built lazily on first use, see derived()
+        self._derived = {}
+        self._extenders = {}
+        self._derived_lock = threading.RLock() # Reentrant: one derived structure may build on another
+
+        # Build topics summary
+        self._build_topic_tables()
+        self._build_aggregates()
+        # base is (previous snapshot, SnapshotDelta) when built by appended()
+        self._build_text_index(base)
+        self._build_rollup(rollup_regions, base)
+        if base is not None:
+            self._carry_derived(*base)
+
+        # Derived arrays are shared between threads, so make accidental writes fail loudly
+        for arr in (self.topic_offsets, self.topic_timestamps, self.token_offsets, self.token_postings,
+                    self.engagement, self.timestamps_ns, self.day, self.sentiment_score):
+            arr.setflags(write=False)
+
+    def __getstate__(self):
+        # Pickled to share with other processes (see utils.shared_snapshot); the lock stays behind
+        with self._derived_lock:
+            state = dict(self.__dict__, _derived=dict(self._derived), _extenders=dict(self._extenders))
+        del state['_derived_lock']
+        state['df'] = _frame_state(self.df)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.df = _frame_from_state(state['df'])
+        self._derived_lock = threading.RLock()
+
+    def _build_topic_tables(self):
+        """Builds summary tables for topics from the topic-partitioned frame."""
+        if self.df.empty:
+            self.topics = {}
+            self.topic_offsets = np.zeros(1, dtype=np.int64)
+            self.topic_timestamps = np.empty(0, dtype=np.int64)
+            return
+
+        codes = self.df['topic'].cat.codes.to_numpy()
+        n_topics = len(self.df['topic'].cat.categories)
+        counts = np.bincount(codes[codes >= 0], minlength=n_topics)
+
+        # Topic code c owns frame rows topic_offsets[c]:topic_offsets[c + 1], and
+        # topic_timestamps holds their (ascending) mention times in the same order
+        self.topic_offsets = np.zeros(n_topics + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.topic_offsets[1:])
+        self.topic_timestamps = timestamp_ns(self.df['timestamp'])[:self.topic_offsets[-1]]
+
+        # The newest mention is the last entry of each non-empty group
+        present = counts > 0
+        last = pd.to_datetime(self.topic_timestamps[self.topic_offsets[1:][present] - 1], utc=True)
+        last_updated = dict(zip(np.flatnonzero(present).tolist(), last))
+
+        # Codes follow first appearance (see partition_by_topic), like Series.unique()
+        categories = self.df['topic'].cat.categories
+        self.topics = {
+            categories[c]: {
+                'total_mentions': int(counts[c]),
+                'last_updated': last_updated[c]
+            } for c in np.flatnonzero(present)
+        }
+
+    def _build_aggregates(self):
+        """Precomputes dataset-wide aggregates served straight from the snapshot."""
+        if self.df.empty:
+            self.platform_counts = {}
+            self.engagement = np.empty(0)
+            self.timestamps_ns = np.empty(0, dtype=np.int64)
+            self.day = np.empty(0, dtype=np.int32)
+            self.sentiment_score = np.empty(0, dtype=np.int64)
+            return
+        counts = self.df['platform'].value_counts()
+        self.platform_counts = counts[counts > 0].to_dict() # Drop categories with no posts
+
+        # Pre-typed per-row columns shared read-only by every request: engagement
+        # (likes + 2*shares + 0.5*comments), int64 ns timestamps (NaT is the int64
+        # minimum), UTC day numbers since the epoch (NaT is NAT_DAY) and
+        # sentiment scores
+        self.engagement = (self.df['likes'].to_numpy(dtype=np.float64)
+                           + 2 * self.df['shares'].to_numpy(dtype=np.float64)
+                           + 0.5 * self.df['comments'].to_numpy(dtype=np.float64))
+        self.timestamps_ns = timestamp_ns(self.df['timestamp'])
+        self.day = np.where(self.timestamps_ns == NAT_NS, NAT_DAY, self.timestamps_ns // NS_PER_DAY).astype(np.int32)
+        self.sentiment_score = category_lookup(self.df['sentiment'], SENTIMENT_SCORES)
+
+    def _rollup_cube(self, by_region, rows=None):
+        """Rolls up all rows, or just the given row positions, into a cube over every category."""
+        df = self.df
+        pick = (lambda a: a) if rows is None else (lambda a: a[rows])
+        return RollupCube(
+            pick(self.day),
+            pick(df['topic'].cat.codes.to_numpy()),
+            pick(df['platform'].cat.codes.to_numpy()),
+            pick(df['region'].cat.codes.to_numpy()) if by_region else None,
+            (len(df['topic'].cat.categories), len(df['platform'].cat.categories),
+             len(df['region'].cat.categories) if by_region else 1),
+            {
+                'likes': pick(df['likes'].to_numpy()),
+                'shares': pick(df['shares'].to_numpy()),
+                'comments': pick(df['comments'].to_numpy()),
+                'sentiment': pick(self.sentiment_score),
+            },
+        )
+
+    def _build_rollup(self, by_region, base=None):
+        """Builds the topic x platform x (region) x day rollup cube."""
+        if self.df.empty:
+            self.rollup = None
+        elif base is not None and base[0].rollup is not None:
+            # Only the appended posts are rolled up; cube cells just add
+            previous, delta = base
+            self.rollup = previous.rollup.merged(self._rollup_cube(by_region, delta.new_rows))
+        else:
+            self.rollup = self._rollup_cube(by_region)
+
+    def _build_text_index(self, base=None):
+        """Builds a token -> row posting-list index over topic, content and hashtags.
+
+        A snapshot built by appending tokenizes only the new rows and carries
+        the previous posting lists over with their rows renumbered.
+        """
+        n = len(self.df)
+        if n == 0:
+            self.token_vocab = pd.Index([], dtype=object)
+            self.token_offsets = np.zeros(1, dtype=np.int64)
+            self.token_postings = np.empty(0, dtype=np.int32)
+            return
+
+        if base is None:
+            new_rows = np.arange(n, dtype=np.int64)
+            tokens = searchable_text(self.df).str.findall(TOKEN_RE).tolist()
+        else:
+            previous, delta = base
+            new_rows = delta.new_rows
+            tokens = searchable_text(self.df.take(new_rows)).str.findall(TOKEN_RE).tolist()
+        lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+        token_ids, vocab = pd.factorize(np.array(list(itertools.chain.from_iterable(tokens)), dtype=object))
+        if base is not None:
+            # New tokens go after the previous vocabulary, so its ids stay valid
+            known = previous.token_vocab
+            fresh = pd.Index(vocab).difference(known, sort=False)
+            token_ids = known.append(fresh).get_indexer(vocab)[token_ids]
+            vocab = known.append(fresh)
+
+        # One entry per distinct (token, row) pair, ordered by token then row
+        pairs = np.unique(token_ids.astype(np.int64) * n + np.repeat(new_rows, lengths))
+        if base is not None:
+            old_ids = np.repeat(np.arange(len(known), dtype=np.int64), np.diff(previous.token_offsets))
+            old_pairs = old_ids * n + delta.positions[previous.token_postings]
+            if delta.keeps_order:
+                # Still sorted, and the new pairs have other rows: merge instead of sorting everything
+                pairs = np.insert(old_pairs, np.searchsorted(old_pairs, pairs), pairs)
+            else:
+                pairs = np.unique(np.concatenate([old_pairs, pairs]))
+        postings_dtype = np.int32 if n < 2 ** 31 else np.int64
+        self.token_vocab = pd.Index(vocab)
+        self.token_postings = (pairs % n).astype(postings_dtype)
+        self.token_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // n, minlength=len(vocab)), out=self.token_offsets[1:])
+
+    def token_rows(self, token):
+        """Returns the sorted row positions whose text contains a (lowercase) token."""
+        loc = self.token_vocab.get_indexer([token])[0]
+        if loc < 0:
+            return self.token_postings[:0]
+        return self.token_postings[self.token_offsets[loc]:self.token_offsets[loc + 1]]
+
+    def derived(self, name, build, extend=None):
+        """Returns a per-snapshot structure, calling build(snapshot) only the first time.
+
+        For expensive indexes that not every deployment needs; they live and die
+        with the snapshot, so a full refresh starts from scratch. Structures
+        given an extend(value, snapshot, delta) are instead carried over to
+        snapshots built by appending rows, at the cost of the new rows only.
+        """
+        with self._derived_lock:
+            if name not in self._derived:
+                with stage(name):
+                    self._derived[name] = build(self)
+                if extend is not None:
+                    self._extenders[name] = extend
+            return self._derived[name]
+
+    def _carry_derived(self, previous, delta):
+        """Extends the previous snapshot's extendable derived structures to this one."""
+        with previous._derived_lock:
+            carried = [(name, previous._derived[name], extend) for name, extend in previous._extenders.items()]
+        for name, value, extend in carried:
+            self._derived[name] = extend(value, self, delta)
+            self._extenders[name] = extend
+
+    @classmethod
+    def appended(cls, previous, rows, source=None):
+        """Builds the snapshot of previous's posts plus newly parsed rows.
+
+        Indexes are extended with the new rows rather than rebuilt. Falls back
+        to a full build if appending would renumber the previous topics.
+        """
+        combined, order = topic_partition(append_rows(previous.df, rows))
+        topics = combined['topic'].cat.categories
+        known = previous.df['topic'].cat.categories
+        if previous.df.empty or not topics[:len(known)].equals(known):
+            return cls(combined, source=source, rollup_regions=previous.rollup_regions)
+        if order is None:
+            order = np.arange(len(combined))
+        delta = SnapshotDelta(order, len(previous.df))
+        return cls(combined.take(order).reset_index(drop=True), source=source,
+                   rollup_regions=previous.rollup_regions, base=(previous, delta))
+
+    def post_rows(self, post_ids):
+        """Row positions of the first post with each post_id (-1 where unknown)."""
+        def build(snapshot):
+            ids = snapshot.df['post_id'].to_numpy()
+            order = np.argsort(ids, kind='stable') # Stable, so duplicates keep their first row
+            return ids[order], order
+        sorted_ids, order = self.derived('post_id_index', build)
+        post_ids = np.asarray(post_ids)
+        pos = np.searchsorted(sorted_ids, post_ids)
+        pos = np.minimum(pos, len(sorted_ids) - 1)
+        found = (len(sorted_ids) > 0) & (sorted_ids[pos] == post_ids)
+        return np.where(found, order[pos], -1)
+
+    def topic_slice(self, topic, start_ns=None, end_ns=None):
+        """Row slice of a topic's posts, optionally limited to start_ns <= timestamp < end_ns."""
+        loc = self.df['topic'].cat.categories.get_indexer([topic])[0] if not self.df.empty else -1
+        if loc < 0:
+            return slice(0, 0)
+        lo, hi = self.topic_offsets[loc], self.topic_offsets[loc + 1]
+        i, j = 0, hi - lo
+        if start_ns is not None:
+            i = np.searchsorted(self.topic_timestamps[lo:hi], start_ns)
+        if end_ns is not None:
+            j = np.searchsorted(self.topic_timestamps[lo:hi], end_ns)
+        return slice(int(lo + i), int(lo + max(i, j)))
+
+    def topic_posts(self, topic, start_ns=None, end_ns=None):
+        """A topic's posts in timestamp order, as a zero-copy slice of the frame."""
+        return self.df.iloc[self.topic_slice(topic, start_ns, end_ns)]
+
+    def latest_topic_posts(self, topic, n):
+        """The n newest posts of a topic, newest first (posts without a timestamp last)."""
+        rows = self.topic_slice(topic)
+        return self.df.iloc[max(rows.start, rows.stop - n):rows.stop].iloc[::-1]
+
+    def topic_rows_between(self, codes, start_ns, end_ns):
+        """Row positions of posts in the given topic codes with start_ns <= timestamp < end_ns."""
+        parts = []
+        for c in codes:
+            lo, hi = self.topic_offsets[c], self.topic_offsets[c + 1]
+            i, j = np.searchsorted(self.topic_timestamps[lo:hi], [start_ns, end_ns])
+            parts.append(np.arange(lo + i, lo + j))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def topic_mention_times(self, topic):
+        """Returns the sorted int64 (ns) mention timestamps of a topic as a view."""
+        return self.topic_timestamps[self.topic_slice(topic)]
+
 
 class DataStore:
-    def __init__(self, csv_path='data/mock_social_trends_5000.csv'):
+    def __init__(self, csv_path='data/mock_social_trends_5000.csv', cache_dir=None, rollup_regions=False,
+                 incremental=True, refresh_minutes=24 * 60):
         self.csv_path = csv_path
-        self._load()
+        # Adds a region axis to the rollup cube (multiplies its size by the number of regions)
+        self.rollup_regions = rollup_regions
+        # Typed columnar snapshot of the CSV, written next to it by default
+        self.cache_dir = cache_dir or cache_path_for(csv_path)
+        # Rows appended to the CSV are parsed on their own and merged into the
+        # published snapshot; any other change triggers a full reload
+        self.incremental = incremental
+        self.refresh_minutes = refresh_minutes
+        self._refresh_lock = threading.Lock()
+        self._preparers = []
+        self._listeners = []
+        self.snapshot, self._watermark = self._build_snapshot()
         self._schedule_refresh()
 
-    @lru_cache(maxsize=None)
-    def _load(self):
-        """Loads and preprocesses the CSV data."""
+    # Read-only shortcuts to the current snapshot for callers outside a request.
+    # Request handlers should pin one snapshot instead of reading these twice.
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def topics(self):
+        return self.snapshot.topics
+
+    def _read_frame(self):
+        """Loads the posts, preferring the columnar snapshot over re-parsing the CSV."""
         if not os.path.exists(self.csv_path):
             raise FileNotFoundError(f"CSV not found at {self.csv_path}")
 
-        df = pd.read_csv(self.csv_path)
+        fingerprint = source_fingerprint(self.csv_path)
+        try:
+            df = read_column_cache(self.cache_dir, fingerprint)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable snapshot at {self.cache_dir}: {e}")
+            df = None
+
+        if df is None:
+            try:
+                self._stream_csv(fingerprint)
+                df = read_column_cache(self.cache_dir, fingerprint)
+            except ValueError as e:
+                # Columns whose type changes between chunks need the whole file to settle it
+                print(f"Could not stream {self.csv_path} ({e}); parsing it in memory")
+                df = self._parse_csv()
+                try:
+                    write_column_cache(df, self.cache_dir, fingerprint)
+                except OSError as e:
+                    print(f"Could not write snapshot to {self.cache_dir}: {e}")
+            except OSError as e:
+                # A read-only data directory just means every start parses the CSV in memory
+                print(f"Could not write snapshot to {self.cache_dir}: {e}")
+                df = self._parse_csv()
+        return df, fingerprint
+
+    def _stream_csv(self, fingerprint):
+        """Parses the CSV chunk by chunk straight into the column cache, laid out by topic.
+
+        Peak memory is one chunk plus the sort keys, so files larger than RAM
+        can be loaded; the cached columns are then memory-mapped.
+        """
+        chunks = (self._prepare(chunk) for chunk in pd.read_csv(self.csv_path, chunksize=CSV_CHUNK_ROWS))
+        write_column_cache_chunked(chunks, self.cache_dir, fingerprint, layout=topic_partition,
+                                   key_columns=('topic', 'timestamp'))
+
+    def _parse_csv(self):
+        """Parses and preprocesses the whole source CSV in memory."""
+        # Partition before caching so cached snapshots load already laid out
+        return partition_by_topic(self._prepare(pd.read_csv(self.csv_path)))
+
+    @staticmethod
+    def _prepare(df):
+        """Preprocesses freshly parsed CSV rows."""
         # Normalize column names (strip whitespace)
         df.columns = [c.strip() for c in df.columns]
         # Ensure timestamp is parsed as UTC datetime objects
@@ -28,40 +579,122 @@ class DataStore:
         df['content'] = df['content'].fillna('')
         df['hashtags'] = df['hashtags'].fillna('')
         df['topic'] = df['topic'].fillna('Unknown')
-        self.df = df
+        return apply_schema(df)
 
-        # Build topics summary
-        self._build_topic_tables()
+    def _build_snapshot(self):
+        """Builds a complete snapshot without touching the published one; returns it with its watermark."""
+        started = time.perf_counter()
+        df, fingerprint = self._read_frame()
+        snapshot = Snapshot(df, source=fingerprint, rollup_regions=self.rollup_regions)
+        record_build('full', time.perf_counter() - started, len(df))
+        return snapshot, self._watermark_at(fingerprint['size'])
 
-    def _build_topic_tables(self):
-        """Builds summary tables for topics."""
-        if self.df.empty:
-            self.topics = {}
-            self.topic_mentions = defaultdict(list)
-            return
+    def _prefix_digest(self, offset):
+        """Hash state over the CSV's first offset bytes."""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.csv_path, 'rb') as f:
+            remaining = offset
+            while remaining > 0:
+                block = f.read(min(WATERMARK_BLOCK, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+        return digest
 
-        topics = self.df['topic'].unique().tolist()
-        self.topics = {
-            t: {
-                'total_mentions': int((self.df['topic'] == t).sum()),
-                'last_updated': self.df[self.df['topic'] == t]['timestamp'].max()
-            } for t in topics
+    def _watermark_at(self, offset, digest=None):
+        """Records how the CSV looked up to a byte offset, so appends after it can be recognized.
+
+        The digest covers every byte before the offset, so any edit to rows
+        already ingested is caught; pass the hash state if it is already known.
+        """
+        if digest is None:
+            digest = self._prefix_digest(offset)
+        with open(self.csv_path, 'rb') as f:
+            header = f.readline()
+            f.seek(max(offset - 1, 0))
+            last = f.read(1) if offset else b''
+        return {
+            'offset': offset,
+            'header': header,
+            'digest': digest.hexdigest(),
+            # Rows can only be appended after a complete last line
+            'complete': last == b'\n',
         }
-        # Topic mentions for time series analysis
-        self.topic_mentions = defaultdict(list)
-        for _, row in self.df.iterrows():
-            self.topic_mentions[row['topic']].append(row['timestamp'])
+
+    def _read_appended(self):
+        """Parses the rows appended to the CSV since the published snapshot.
+
+        Returns (rows, watermark), with rows None when no complete line was
+        added yet, or None when the file changed in any other way. A partly
+        written last line is left for the next refresh.
+        """
+        mark = self._watermark
+        if mark is None or not mark['complete'] or os.path.getsize(self.csv_path) < mark['offset']:
+            return None
+        digest = self._prefix_digest(mark['offset'])
+        if digest.hexdigest() != mark['digest']:
+            return None # Rows already ingested were edited
+        with open(self.csv_path, 'rb') as f:
+            f.seek(mark['offset'])
+            tail = f.read()
+        tail = tail[:tail.rfind(b'\n') + 1]
+        if not tail.strip():
+            return None, mark
+        rows = self._prepare(pd.read_csv(io.BytesIO(mark['header'] + tail)))
+        digest.update(tail)
+        return rows, self._watermark_at(mark['offset'] + len(tail), digest)
+
+    def _next_snapshot(self):
+        """Builds the snapshot to publish next with its watermark, or (None, None) if the CSV is unchanged."""
+        fingerprint = source_fingerprint(self.csv_path)
+        if fingerprint == self.snapshot.source:
+            return None, None
+        if self.incremental:
+            appended = self._read_appended()
+            if appended is not None:
+                rows, watermark = appended
+                if rows is None or rows.empty:
+                    return None, None
+                print(f"Appending {len(rows)} new rows")
+                started = time.perf_counter()
+                # The column cache still holds the older rows; it is rewritten by the next full load
+                snapshot = Snapshot.appended(self.snapshot, rows, source=fingerprint)
+                record_build('append', time.perf_counter() - started, len(rows))
+                return snapshot, watermark
+        return self._build_snapshot()
+
+    def on_build(self, callback):
+        """Registers a callback invoked with each refreshed snapshot before it is published."""
+        self._preparers.append(callback)
+
+    def on_publish(self, callback):
+        """Registers a callback invoked with each newly published snapshot."""
+        self._listeners.append(callback)
 
     def refresh(self):
-        """Reloads the data from the CSV and clears caches."""
-        print("Refreshing data store...")
-        self._load.cache_clear()  # Clear the cache to force a reload
-        self._load()
-        print("Data store refreshed.")
+        """Publishes a new snapshot if the CSV changed, merging in appended rows when possible."""
+        # Serialize refreshes; readers are never blocked since they only
+        # see the old snapshot until the reference swap below.
+        with self._refresh_lock:
+            print("Refreshing data store...")
+            snapshot, watermark = self._next_snapshot()
+            if snapshot is None:
+                print("Data store unchanged.")
+                return
+            # Readers keep the old snapshot while the new one is warmed up
+            for callback in self._preparers:
+                callback(snapshot)
+            self.snapshot = snapshot # Single reference swap publishes the new data
+            self._watermark = watermark
+            for callback in self._listeners:
+                callback(snapshot)
+            print(f"Data store refreshed (version {snapshot.version}).")
         
     def _schedule_refresh(self):
         """Schedules the data refresh to run periodically."""
-        schedule.every(24).hours.do(self.refresh)
+        # Unchanged files cost a stat and a fingerprint, appends only their new rows
+        schedule.every(self.refresh_minutes).minutes.do(self.refresh)
         
         def run_scheduler():
             while True:
@@ -71,4 +704,4 @@ class DataStore:
         # Run the scheduler in a separate thread
         thread = threading.Thread(target=run_scheduler)
         thread.daemon = True
-        thread.start()
\ No newline at end of file
+        thread.start()
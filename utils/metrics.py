@@ -0,0 +1,179 @@
+import bisect
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Histogram bucket upper bounds, in milliseconds; slower observations land in a final overflow bucket
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Lines of profile output returned for ?profile=1
+PROFILE_LINES = 40
+
+# Off unless the app enables it; stage() then costs one flag check
+_enabled = False
+_NOOP = nullcontext()
+# Stages timed while serving the current request, as (name, seconds); None outside requests.
+# Offloaded work runs in a copy of the request's context, so its stages land here too
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+# Set while a request is profiled, so caches and the offload pool are bypassed
+_profiling = contextvars.ContextVar('profiling', default=False)
+
+
+def enable(on=True):
+    """Turns stage and request timing on or off process-wide."""
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def profiling():
+    """Whether the current request is being profiled."""
+    return _profiling.get()
+
+
+class Histogram:
+    """Thread-safe latency histogram over fixed buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self._sum += ms
+            self._max = max(self._max, ms)
+
+    def stats(self):
+        """Count, mean and bucket-resolution percentiles, plus [upper bound, cumulative count] per bucket."""
+        with self._lock:
+            counts, total, largest = list(self._counts), self._sum, self._max
+        count = sum(counts)
+        cumulative, running = [], 0
+        for bound, n in zip(list(self.buckets) + ['inf'], counts):
+            running += n
+            cumulative.append([bound, running])
+
+        def percentile(q):
+            # Upper bound of the bucket holding the q-th observation; the largest one past the last bucket
+            if not count:
+                return None
+            rank = q * count
+            for bound, seen in cumulative[:-1]:
+                if seen >= rank:
+                    return min(bound, round(largest, 3))
+            return round(largest, 3)
+        return {
+            'count': count,
+            'sum_ms': round(total, 3),
+            'mean_ms': round(total / count, 3) if count else None,
+            'p50_ms': percentile(0.5),
+            'p90_ms': percentile(0.9),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(largest, 3),
+            'buckets': cumulative,
+        }
+
+
+class HistogramFamily:
+    """Histograms created on first use, one per name."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        histogram.observe(ms)
+
+    def stats(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histogram.stats() for name, histogram in sorted(histograms.items())}
+
+
+# Request latency per route, time per named stage, and snapshot build durations per kind
+ROUTES = HistogramFamily()
+STAGES = HistogramFamily()
+BUILDS = HistogramFamily()
+_last_builds = {}
+
+
+@contextmanager
+def _timed_stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGES.observe(name, elapsed * 1000)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def stage(name):
+    """Times a block as a named stage when metrics are enabled; a shared no-op otherwise."""
+    if not _enabled:
+        return _NOOP
+    return _timed_stage(name)
+
+
+def record_build(kind, seconds, rows=None):
+    """Records how long building or attaching a snapshot took; always on, as builds are rare."""
+    BUILDS.observe(kind, seconds * 1000)
+    _last_builds[kind] = {'seconds': round(seconds, 3), 'rows': rows,
+                          'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+
+
+def build_stats():
+    return {kind: dict(stats, last=_last_builds.get(kind)) for kind, stats in BUILDS.stats().items()}
+
+
+def begin_request():
+    """Starts collecting the stages of the request served by this context."""
+    _request_stages.set([])
+
+
+def end_request(route, seconds):
+    """Records a finished request; returns its Server-Timing header value."""
+    ROUTES.observe(route, seconds * 1000)
+    totals = {}
+    for name, elapsed in _request_stages.get() or ():
+        totals[name] = totals.get(name, 0.0) + elapsed
+    _request_stages.set(None)
+    parts = [f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in totals.items()]
+    parts.append(f'total;dur={seconds * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class RequestProfile:
+    """Profiles one request with cProfile, bypassing the caches so the real work shows up."""
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+        self._token = None
+
+    def start(self):
+        self._token = _profiling.set(True)
+        self._profiler.enable()
+
+    def stop(self):
+        """Stops profiling; returns the report, slowest cumulative time first."""
+        self._profiler.disable()
+        _profiling.reset(self._token)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return out.getvalue()
@@ -0,0 +1,105 @@
+import numpy as np
+
+# Bytes the packed item x transaction bitsets may use; the rarest candidate
+# items are dropped when a corpus would need more
+MAX_BITSET_BYTES = 256 * 1024 * 1024
+
+
+# Set bits per byte value, for numpy releases before 2.0 that lack np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+_bitwise_count = getattr(np, 'bitwise_count', lambda bits: _BYTE_POPCOUNT[bits])
+
+
+def _popcounts(bits):
+    """Number of set bits in each row of a packed uint8 matrix."""
+    return _bitwise_count(bits).sum(axis=1, dtype=np.int64)
+
+
+def pack_transactions(postings, n_transactions, min_count, max_bytes=MAX_BITSET_BYTES):
+    """Packs item posting lists into one bitset per frequent item.
+
+    postings is a list of (transaction ids, item ids) array pairs; the same
+    item may be listed twice for a transaction. Items seen in fewer than
+    min_count transactions are pruned before anything is packed, and when the
+    survivors would not fit in max_bytes only the most frequent are kept.
+    Returns (items, bits, supports) with bits shaped [items, ceil(n / 8)].
+    """
+    n_items = 1 + max((int(items.max()) for _, items in postings if len(items)), default=-1)
+    upper = np.zeros(n_items, dtype=np.int64)
+    for _, items in postings:
+        upper += np.bincount(items, minlength=n_items)
+    # Raw occurrence counts can only overstate support, so they are a safe first cut
+    candidates = np.flatnonzero(upper >= min_count)
+    width = (n_transactions + 7) // 8
+    budget = max_bytes // max(width, 1)
+    if len(candidates) > budget:
+        print(f"Itemset mining: keeping the {budget} most frequent of {len(candidates)} candidate items")
+        candidates = candidates[np.argsort(-upper[candidates], kind='stable')[:budget]]
+        candidates.sort()
+
+    slot = np.full(n_items, -1, dtype=np.int64)
+    slot[candidates] = np.arange(len(candidates))
+    bits = np.zeros((len(candidates), width), dtype=np.uint8)
+    for tids, items in postings:
+        keep = slot[items] >= 0
+        tids = tids[keep]
+        np.bitwise_or.at(bits, (slot[items[keep]], tids >> 3), (1 << (tids & 7)).astype(np.uint8))
+
+    supports = _popcounts(bits)
+    frequent = supports >= min_count
+    return candidates[frequent], bits[frequent], supports[frequent]
+
+
+def frequent_itemsets(items, bits, supports, min_count, max_len=3, max_itemsets=100000):
+    """Enumerates frequent itemsets with Eclat over packed bitsets.
+
+    Takes the output of pack_transactions and returns {itemset tuple: support}.
+    Each extension step only looks at the bytes where its prefix has any
+    transactions, so deep levels cost as much as their support rather than
+    the corpus size. Enumeration stops after max_itemsets results.
+    """
+    # Rarest items first keeps the prefix bitsets sparse
+    order = np.argsort(supports, kind='stable')
+    result = {}
+
+    def extend(prefix, items, bits, supports):
+        for i in range(len(items)):
+            if len(result) >= max_itemsets:
+                return
+            itemset = prefix + (int(items[i]),)
+            result[itemset] = int(supports[i])
+            if len(itemset) >= max_len or i + 1 == len(items):
+                continue
+            cols = np.flatnonzero(bits[i])
+            child_bits = bits[i + 1:, cols] & bits[i, cols]
+            child_supports = _popcounts(child_bits)
+            keep = child_supports >= min_count
+            if keep.any():
+                extend(itemset, items[i + 1:][keep], child_bits[keep], child_supports[keep])
+
+    extend((), items[order], bits[order], supports[order])
+    return result
+
+
+def rules_from_itemsets(itemsets, n_transactions, min_confidence=0.5, min_lift=1.0):
+    """Derives antecedent -> consequent rules from frequent itemsets.
+
+    Yields (antecedent, consequent, support, confidence, lift) with support
+    as a fraction of all transactions. Splits whose parts were not
+    enumerated (after max_itemsets cut the search short) are skipped.
+    """
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for mask in range(1, (1 << len(itemset)) - 1):
+            antecedent = tuple(x for j, x in enumerate(itemset) if mask >> j & 1)
+            consequent = tuple(x for j, x in enumerate(itemset) if not mask >> j & 1)
+            # Subsets keep the enumeration order, so they are looked up directly
+            antecedent_count = itemsets.get(antecedent)
+            consequent_count = itemsets.get(consequent)
+            if not antecedent_count or not consequent_count:
+                continue
+            confidence = count / antecedent_count
+            lift = confidence * n_transactions / consequent_count
+            if confidence >= min_confidence and lift >= min_lift:
+                yield antecedent, consequent, count / n_transactions, confidence, lift
@@ -0,0 +1,159 @@
+import contextvars
+import inspect
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import wraps
+
+from utils.metrics import profiling
+
+# Threads that run heavy analytics. Request threads only wait on them, so
+# cheap endpoints keep their threads (and most of the GIL) while heavy work
+# is capped at this many computations at once.
+OFFLOAD_WORKERS = max(2, os.cpu_count() or 1)
+# Seconds a request waits for a heavy result before giving up with 503; the
+# computation itself carries on and caches its result for the retry
+OFFLOAD_TIMEOUT = 30
+# Requests per function allowed to wait for a free slot before new ones are turned away
+OFFLOAD_BACKLOG = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """The shared offload executor, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS, thread_name_prefix='offload')
+        return _executor
+
+
+class Overloaded(Exception):
+    """A heavy computation could not be admitted or did not finish in time; retry later."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, func):
+        """Calls func() unless a call with this key is in flight, in which case its result is shared."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def submit(self, key, start):
+        """Returns the in-flight future for key, or one that follows the future start() returns."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future
+            future = self._calls[key] = Future()
+
+        def settle(done):
+            with self._lock:
+                del self._calls[key]
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+        # start() may block waiting for capacity, so it runs outside the lock
+        try:
+            started = start()
+        except BaseException as e:
+            failed = Future()
+            failed.set_exception(e)
+            settle(failed)
+            raise
+        started.add_done_callback(settle)
+        return future
+
+
+def offloaded(limit=2, backlog=OFFLOAD_BACKLOG, timeout=OFFLOAD_TIMEOUT):
+    """Runs a heavy function of (snapshot, ...) on the offload executor.
+
+    At most limit calls of the function run at once and at most backlog more
+    wait for a slot; beyond that callers get Overloaded straight away.
+    Concurrent calls with the same snapshot version and arguments share one
+    computation. Stack it on top of @cached: results that are already
+    cached are returned without touching the executor. The wrapper's
+    submit() returns the shared Future instead of waiting, for callers that
+    can await it (asyncio.wrap_future).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        flights = SingleFlight()
+        slots = threading.BoundedSemaphore(limit)
+        waiting = [0]
+        waiting_lock = threading.Lock()
+
+        def start(datastore, args, kwargs):
+            with waiting_lock:
+                if waiting[0] >= backlog:
+                    raise Overloaded(f"Too many {func.__name__} requests waiting")
+                waiting[0] += 1
+            try:
+                if not slots.acquire(timeout=timeout):
+                    raise Overloaded(f"Timed out waiting to run {func.__name__}")
+            finally:
+                with waiting_lock:
+                    waiting[0] -= 1
+            try:
+                # The request's context goes along, so the work's stage timings are reported with it
+                context = contextvars.copy_context()
+                future = executor().submit(context.run, func, datastore, *args, **kwargs)
+            except BaseException:
+                slots.release()
+                raise
+            future.add_done_callback(lambda _: slots.release())
+            return future
+
+        def submit(datastore, *args, **kwargs):
+            bound = signature.bind(datastore, *args, **kwargs)
+            bound.apply_defaults()
+            key = (datastore.version, tuple(list(bound.arguments.items())[1:]))
+            return flights.submit(key, lambda: start(datastore, args, kwargs))
+
+        @wraps(func)
+        def wrapper(datastore, *args, **kwargs):
+            if profiling(): # The profiler only sees work on the request's own thread
+                return func(datastore, *args, **kwargs)
+            peek = getattr(func, 'peek', None)
+            if peek is not None:
+                hit, value = peek(datastore, *args, **kwargs)
+                if hit:
+                    return value
+            try:
+                return submit(datastore, *args, **kwargs).result(timeout=timeout)
+            except FutureTimeoutError:
+                raise Overloaded(f"{func.__name__} did not finish within {timeout}s")
+
+        wrapper.submit = submit
+        return wrapper
+    return decorator
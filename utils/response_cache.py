@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import time
+from functools import wraps
+
+from flask import Response, g, request
+
+from utils.cache import ResultCache
+from utils.metrics import profiling
+
+try:
+    import brotli
+except ImportError: # Optional; responses are offered gzipped only without it
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6
+
+# Encoded response bodies keyed on (endpoint, snapshot version, query, time bucket)
+RESPONSE_CACHE = ResultCache(max_entries=512, max_bytes=64 * 1024 * 1024)
+
+
+def _accepted_encodings():
+    """Content codings the client accepts, ignoring any q=0 entries."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _encode(body):
+    """The body in every coding we can offer, identity first."""
+    bodies = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        bodies['gzip'] = gzip.compress(body, GZIP_LEVEL)
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body)
+    return bodies
+
+
+def _send(bodies, etag, mimetype):
+    """Builds a response from a cached entry in the best coding the client accepts."""
+    accepted = _accepted_encodings()
+    coding = next((c for c in ('br', 'gzip') if c in bodies and c in accepted), 'identity')
+    response = Response(bodies[coding], mimetype=mimetype)
+    if coding != 'identity':
+        response.headers['Content-Encoding'] = coding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate; a matching ETag costs a 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(ttl=None, cache=None):
+    """Serves a GET view from encoded bodies cached per snapshot version.
+
+    The ETag covers the endpoint, the pinned snapshot's version and the
+    sorted query parameters, so If-None-Match is answered with 304 without
+    running the view. Pass ttl (seconds) for views whose results depend on
+    the wall clock; their ETags also change every ttl seconds. Only 200
+    responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if profiling():
+                return view(*args, **kwargs)
+            store = cache if cache is not None else RESPONSE_CACHE
+            params = tuple(sorted(request.args.items(multi=True)))
+            bucket = int(time.time() // ttl) if ttl else None
+            key = (request.endpoint, g.snapshot.version, params, bucket)
+            etag = '%d-%s' % (g.snapshot.version, hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest())
+
+            if request.if_none_match.contains_weak(etag): # Proxies may weaken our tags
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            hit, entry = store.get(key)
+            if hit:
+                return _send(entry[0], etag, entry[1])
+
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != 200:
+                return response # Errors, and (body, status) tuples, go out as they are
+            entry = (_encode(response.get_data()), response.mimetype)
+            store.put(key, entry, ttl=ttl)
+            return _send(entry[0], etag, entry[1])
+
+        return wrapper
+    return decorator
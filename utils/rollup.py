@@ -0,0 +1,157 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+NAT_NS = np.iinfo(np.int64).min # How NaT is stored in int64 timestamp arrays
+NAT_DAY = np.iinfo(np.int32).min # ...and in int32 day-number arrays
+# Days the dense day axis may span, counted back from the newest post. Older
+# posts (often bad timestamps such as 1970) would otherwise widen every metric
+# array by one cell per topic x platform x region for each day in between
+ROLLUP_RETENTION_DAYS = 10 * 366
+# Posts dated further than this past today are treated as bad timestamps too
+ROLLUP_FUTURE_DAYS = 31
+
+
+def day_window(day, retention_days=ROLLUP_RETENTION_DAYS):
+    """First and last day the cube covers for posts on these (valid) days; (0, -1) when there are none."""
+    if len(day) == 0:
+        return 0, -1
+    today = time.time_ns() // NS_PER_DAY
+    current = day[day <= today + ROLLUP_FUTURE_DAYS]
+    last = int(current.max()) if len(current) else int(day.max()) # Anchor on the newest plausible post
+    return int(day[day > last - retention_days].min()), last
+
+
+class RollupCube:
+    """Dense daily rollup of the posts indexed by [topic, platform, region, day].
+
+    Axes use category codes, and the day axis covers every UTC day from the
+    first to the last post, at most retention_days of them (see day_window).
+    When regions aren't rolled up the region axis has length 1. Posts with a
+    missing platform or region go to one extra slot at the end of that axis,
+    so topic totals still count them while per-platform results leave them
+    out, just as groupby drops missing keys. Posts with a missing timestamp or
+    topic are left out, as are posts outside the day window; dropped counts
+    the latter.
+    """
+
+    def __init__(self, day, topic, platform, region, sizes, weights, retention_days=ROLLUP_RETENTION_DAYS):
+        n_topics, self.n_platforms, n_regions = sizes
+        self.by_region = region is not None
+        self.retention_days = retention_days
+        keep = (day != NAT_DAY) & (topic >= 0)
+        first_day, last_day = day_window(day[keep], retention_days)
+        inside = keep & (day >= first_day) & (day <= last_day)
+        self.dropped = int(keep.sum() - inside.sum())
+        if self.dropped:
+            print(f"Rollup: left out {self.dropped} posts dated outside "
+                  f"{np.datetime64(first_day, 'D')} to {np.datetime64(last_day, 'D')}")
+        keep = inside
+        # Missing codes (-1) land in the trailing slot
+        platform = np.where(platform[keep] >= 0, platform[keep], self.n_platforms)
+        n_platforms = self.n_platforms + 1
+        if region is None:
+            region = np.zeros(int(keep.sum()), dtype=np.int8)
+        else:
+            region = np.where(region[keep] >= 0, region[keep], n_regions)
+            n_regions += 1
+
+        day = day[keep].astype(np.int64)
+        self.first_day = first_day
+        n_days = last_day - first_day + 1
+        self.shape = (n_topics, n_platforms, n_regions, n_days)
+
+        # One flat cell index per post, then a bincount per metric
+        cell = ((topic[keep].astype(np.int64) * n_platforms + platform) * n_regions + region) * n_days + (day - self.first_day)
+        size = int(np.prod(self.shape))
+        self.counts = np.bincount(cell, minlength=size).reshape(self.shape)
+        self.sums = {
+            name: np.bincount(cell, weights=values[keep], minlength=size).round().astype(np.int64).reshape(self.shape)
+            for name, values in weights.items()
+        }
+        self._freeze()
+
+    def _freeze(self):
+        """Makes the arrays read-only; cubes are shared between threads."""
+        for arr in [self.counts] + list(self.sums.values()):
+            arr.setflags(write=False)
+
+    def _placed(self, arr, shape, first_day):
+        """arr laid out on a larger cube's axes, keeping known codes and moving the missing slots to the new ends.
+
+        Days outside the new day axis are cut off.
+        """
+        out = np.zeros(shape, dtype=arr.dtype)
+        n_topics, n_platforms, n_regions, n_days = arr.shape
+        lo = max(first_day - self.first_day, 0)
+        hi = max(min(first_day + shape[3] - self.first_day, n_days), lo)
+        arr = arr[..., lo:hi]
+        days = slice(self.first_day + lo - first_day, self.first_day + hi - first_day)
+        platforms = [(slice(0, n_platforms - 1), slice(0, n_platforms - 1)), (n_platforms - 1, shape[1] - 1)]
+        regions = [(slice(0, 1), slice(0, 1))]
+        if self.by_region:
+            regions = [(slice(0, n_regions - 1), slice(0, n_regions - 1)), (n_regions - 1, shape[2] - 1)]
+        for src_p, dst_p in platforms:
+            for src_r, dst_r in regions:
+                out[:n_topics, dst_p, dst_r, days] = arr[:, src_p, src_r, :]
+        return out
+
+    def merged(self, other):
+        """A cube holding the posts of both cubes.
+
+        other must roll up the same metrics over the same or extended
+        categories (new codes appended), as when posts are appended to a
+        snapshot; the day axis grows to cover both, up to retention_days back
+        from the newer one's last day.
+        """
+        spans = [(c.first_day, c.first_day + c.n_days) for c in (self, other) if c.n_days]
+        end = max(stop for _, stop in spans) if spans else 0
+        # Spans lying wholly before the retention window are dropped rather than stretching the axis
+        window = end - self.retention_days
+        first_day = max(min(start for start, stop in spans if stop > window), window) if spans else 0
+        shape = other.shape[:3] + (end - first_day,)
+
+        cube = object.__new__(RollupCube)
+        cube.by_region, cube.n_platforms = other.by_region, other.n_platforms
+        cube.retention_days = self.retention_days
+        cube.first_day, cube.shape = first_day, shape
+        cube.counts = self._placed(self.counts, shape, first_day) + other._placed(other.counts, shape, first_day)
+        cube.dropped = self.dropped + other.dropped + int(self.counts.sum() + other.counts.sum() - cube.counts.sum())
+        cube.sums = {
+            name: self._placed(values, shape, first_day) + other._placed(other.sums[name], shape, first_day)
+            for name, values in self.sums.items()
+        }
+        cube._freeze()
+        return cube
+
+    @property
+    def n_days(self):
+        return self.shape[3]
+
+    def day_index(self, ts):
+        """Index on the day axis of the UTC day containing a timestamp (may be out of range)."""
+        return int(pd.Timestamp(ts).value // NS_PER_DAY) - self.first_day
+
+    def dates(self, days):
+        """ISO date strings for day-axis indexes."""
+        return np.datetime_as_string((np.asarray(days) + self.first_day).astype('datetime64[D]')).tolist()
+
+    def select(self, metric='counts', topics=None, days=None, by_platform=False):
+        """Sums a metric over the chosen topic codes and all regions.
+
+        days is a slice on the day axis. Returns a [platform, day] array (known
+        platforms only) when by_platform is set, otherwise a [day] array.
+        """
+        cube = self.counts if metric == 'counts' else self.sums[metric]
+        if topics is not None:
+            cube = cube[np.asarray(topics, dtype=np.intp)]
+        if days is not None:
+            cube = cube[..., days]
+        out = cube.sum(axis=(0, 2))
+        return out[:self.n_platforms] if by_platform else out.sum(axis=0)
+
+    def topic_day_counts(self):
+        """Post counts as a [topic, day] matrix."""
+        return self.counts.sum(axis=(1, 2))
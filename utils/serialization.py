@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+from utils.metrics import stage
+
+try:
+    import orjson
+except ImportError: # Optional; the standard library encoder is used without it
+    orjson = None
+
+# Fields of a post in API responses; all strings except the engagement counters
+POST_FIELDS = ['post_id', 'platform', 'user', 'content', 'hashtags', 'topic', 'likes', 'shares', 'comments',
+               'sentiment', 'timestamp', 'region']
+POST_COUNT_FIELDS = {'likes', 'shares', 'comments'}
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def records(**columns):
+    """Zips equal-length columns into a list of dicts, one per row."""
+    names = list(columns)
+    values = [v.tolist() if isinstance(v, np.ndarray) else list(v) for v in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _with_missing(values, missing, fill):
+    """Object array of values with fill wherever missing is set."""
+    values = np.asarray(values, dtype=object)
+    if missing.any():
+        values = values.copy()
+        values[missing] = fill
+    return values
+
+
+def format_timestamps(series, iso=False):
+    """Formats a timestamp column in one pass.
+
+    iso=True gives '2025-08-15T14:35:08Z' strings and None for NaT, like
+    strftime(ISO_FORMAT); otherwise the str(Timestamp) form
+    '2025-08-15 14:35:08+00:00' and 'NaT'.
+    """
+    if series.empty: # numpy's string functions reject empty arrays
+        return np.empty(0, dtype=object)
+    missing = series.isna().to_numpy()
+    utc = str(series.dt.tz) == 'UTC'
+    stamps = series.dt.tz_convert(None).to_numpy() if series.dt.tz is not None else series.to_numpy()
+    whole_seconds = (stamps[~missing].astype('datetime64[ns]').view(np.int64) % 10 ** 9 == 0).all()
+    if iso and (utc or series.dt.tz is None):
+        text = np.char.add(np.datetime_as_string(stamps, unit='s'), 'Z')
+    elif not iso and utc and whole_seconds:
+        text = np.char.add(np.char.replace(np.datetime_as_string(stamps, unit='s'), 'T', ' '), '+00:00')
+    else: # Other time zones and sub-second stamps take pandas' formatter
+        text = series.dt.strftime(ISO_FORMAT) if iso else series.astype(str)
+    return _with_missing(text, missing, None if iso else 'NaT')
+
+
+def post_records(df, **extra):
+    """Formats a frame of posts for API responses column by column.
+
+    Produces the same values as formatting each row on its own: counters as
+    ints, everything else as strings. extra adds more columns, such as scores.
+    """
+    columns = {}
+    for field in POST_FIELDS:
+        if field not in df:
+            columns[field] = [0 if field in POST_COUNT_FIELDS else ''] * len(df)
+        elif field in POST_COUNT_FIELDS:
+            columns[field] = df[field].to_numpy()
+        elif field == 'timestamp':
+            columns[field] = format_timestamps(df[field])
+        else:
+            col = df[field]
+            text = col.astype(str).to_numpy(dtype=object)
+            missing = col.isna().to_numpy()
+            if missing.any(): # Missing values read 'nan' or 'None', whatever str() gives
+                text = text.copy()
+                text[missing] = [str(v) for v in col.to_numpy(dtype=object)[missing]]
+            columns[field] = text
+    columns.update(extra)
+    return records(**columns)
+
+
+def frame_records(df):
+    """Converts a frame to JSON-ready records: ISO timestamps, native scalars and None for missing values."""
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        missing = col.isna().to_numpy()
+        if isinstance(col.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(col.dtype):
+            columns[name] = format_timestamps(col, iso=True)
+        elif pd.api.types.is_numeric_dtype(col.dtype) and not missing.any():
+            columns[name] = col.to_numpy() # tolist() yields native ints/floats
+        else:
+            columns[name] = _with_missing(col.to_numpy(dtype=object), missing, None)
+    return records(**columns)
+
+
+def _encode_default(value):
+    """Lets the standard library encoder handle numpy values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Matches jsonify's compact, key-sorted output
+_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'), default=_encode_default)
+
+
+def json_response(payload, status=200):
+    """Encodes a payload as a JSON response, with orjson when it is installed.
+
+    Without orjson the standard encoder's chunks are streamed to the client
+    instead of being joined into one string first.
+    """
+    if orjson is not None:
+        with stage('json_encode'):
+            body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        return Response(body, status=status, mimetype='application/json')
+    return Response(_ENCODER.iterencode(payload), status=status, mimetype='application/json')
@@ -0,0 +1,172 @@
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from utils.metrics import record_build
+
+# Bump whenever the published layout changes
+SHARED_FORMAT = 2
+# Names inside the shared directory: the pointer to the live version, and each version's files
+CURRENT = 'CURRENT'
+STATE_FILE = 'snapshot.pkl'
+BUFFERS_FILE = 'buffers.bin'
+MANIFEST = 'manifest.json'
+# Published versions kept on disk; workers may still be mapping the previous one
+KEEP_VERSIONS = 2
+# Buffer offsets are aligned so every dtype can view them in place
+BUFFER_ALIGNMENT = 64
+# Seconds between workers' checks for a newly published version
+POLL_SECONDS = 1.0
+
+
+def publish_snapshot(snapshot, root, keep=KEEP_VERSIONS):
+    """Writes a snapshot where other processes can map it, then points CURRENT at it.
+
+    The snapshot is pickled with its numpy arrays (columns, indexes, rollups
+    and any derived structures built so far) kept out of band in one file,
+    so readers map them instead of copying. Returns the version directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    # Readers version the snapshot by publish time instead of the loader's own
+    # counter, which restarts with the loader; every worker sees the same
+    # version, so ETags and cursors stay valid whichever worker answers
+    version = time.time_ns() // 1000
+    name = f'v{version}'
+    tmp_dir = os.path.join(root, name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    buffers = []
+    state = pickle.dumps(snapshot, protocol=5, buffer_callback=buffers.append)
+    spans = []
+    with open(os.path.join(tmp_dir, BUFFERS_FILE), 'wb') as f:
+        for buffer in buffers:
+            f.write(b'\0' * (-f.tell() % BUFFER_ALIGNMENT))
+            raw = buffer.raw()
+            spans.append((f.tell(), raw.nbytes))
+            f.write(raw)
+    with open(os.path.join(tmp_dir, STATE_FILE), 'wb') as f:
+        f.write(state)
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump({'format': SHARED_FORMAT, 'version': version, 'buffers': spans}, f)
+    os.replace(tmp_dir, os.path.join(root, name))
+
+    # Swap the pointer in one rename so readers never see a partial version
+    pointer = os.path.join(root, CURRENT + '.tmp')
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, CURRENT))
+
+    # Mapped files stay readable after unlinking, so old versions can go right away
+    versions = sorted((d for d in os.listdir(root) if d.startswith('v') and not d.endswith('.tmp')),
+                      key=lambda d: os.path.getmtime(os.path.join(root, d)))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return os.path.join(root, name)
+
+
+def current_version(root):
+    """Name of the published version directory, or None before the first publish."""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def open_snapshot(path):
+    """Maps a published snapshot read-only; its arrays share the page cache with every other reader."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SHARED_FORMAT:
+        raise ValueError(f"Unsupported shared snapshot format in {path}")
+    data = os.path.join(path, BUFFERS_FILE)
+    mapped = np.memmap(data, dtype=np.uint8, mode='r') if os.path.getsize(data) else np.empty(0, dtype=np.uint8)
+    buffers = [mapped[start:start + size] for start, size in manifest['buffers']]
+    with open(os.path.join(path, STATE_FILE), 'rb') as f:
+        snapshot = pickle.loads(f.read(), buffers=buffers)
+    snapshot.version = manifest['version']
+    return snapshot
+
+
+class SharedSnapshotStore:
+    """Read-only stand-in for DataStore in worker processes.
+
+    Serves the snapshots a loader process publishes with publish_snapshot:
+    nothing is parsed or refreshed here, and a background thread attaches to
+    each new version as CURRENT changes.
+    """
+
+    def __init__(self, root, poll_seconds=POLL_SECONDS):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self._preparers = []
+        self._listeners = []
+        self._name = self._wait_for_version()
+        started = time.perf_counter()
+        self.snapshot = open_snapshot(os.path.join(root, self._name))
+        record_build('attach', time.perf_counter() - started, len(self.snapshot.df))
+        print(f"Attached to shared snapshot {self._name}")
+        self._watch()
+
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def topics(self):
+        return self.snapshot.topics
+
+    def on_build(self, callback):
+        """Registers a callback invoked with each newly attached snapshot before it is served."""
+        self._preparers.append(callback)
+
+    def on_publish(self, callback):
+        """Registers a callback invoked with each newly served snapshot."""
+        self._listeners.append(callback)
+
+    def _wait_for_version(self):
+        """Blocks until the loader has published a first version."""
+        name = current_version(self.root)
+        if name is None:
+            print(f"Waiting for a snapshot to be published in {self.root}...")
+        while name is None:
+            time.sleep(self.poll_seconds)
+            name = current_version(self.root)
+        return name
+
+    def check(self):
+        """Attaches to the published version if it changed since the last check."""
+        name = current_version(self.root)
+        if name is None or name == self._name:
+            return
+        started = time.perf_counter()
+        try:
+            snapshot = open_snapshot(os.path.join(self.root, name))
+        except (OSError, ValueError) as e:
+            # Superseded and cleaned up while we were reading it; the next check picks up its successor
+            print(f"Could not attach to shared snapshot {name}: {e}")
+            return
+        record_build('attach', time.perf_counter() - started, len(snapshot.df))
+        for callback in self._preparers:
+            callback(snapshot)
+        self.snapshot, self._name = snapshot, name
+        for callback in self._listeners:
+            callback(snapshot)
+        print(f"Attached to shared snapshot {name}")
+
+    def _watch(self):
+        """Polls for new versions in a daemon thread."""
+        def run():
+            while True:
+                time.sleep(self.poll_seconds)
+                self.check()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
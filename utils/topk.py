@@ -0,0 +1,53 @@
+import base64
+import json
+
+import numpy as np
+
+
+def top_k(scores, k, after=None):
+    """Returns the positions of the k highest scores, best first.
+
+    Ties are broken by position so the order is total and pages are stable.
+    With after=(score, position) only entries ranked strictly below that
+    cursor are considered, so later pages never revisit earlier ones.
+    Uses argpartition, so the cost is linear in len(scores) plus k log k.
+    """
+    scores = np.asarray(scores)
+    positions = np.arange(len(scores))
+    if after is not None:
+        score, position = after
+        below = (scores < score) | ((scores == score) & (positions > position))
+        positions = positions[below]
+    if k <= 0 or len(positions) == 0:
+        return positions[:0]
+
+    candidate_scores = scores[positions]
+    if k < len(positions):
+        # Everything above the k-th best value is in; fill the rest from the
+        # entries tied with it, lowest position first
+        kth = -np.partition(-candidate_scores, k - 1)[k - 1]
+        above = candidate_scores > kth
+        tied = np.flatnonzero(candidate_scores == kth)[:k - int(above.sum())]
+        keep = np.flatnonzero(above)
+        positions = positions[np.concatenate([keep, tied])]
+        candidate_scores = scores[positions]
+
+    return positions[np.lexsort((positions, -candidate_scores))]
+
+
+def encode_cursor(version, score, position):
+    """Opaque pagination token pointing just past (score, position) in one snapshot."""
+    raw = json.dumps({'v': version, 's': float(score), 'i': int(position)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, version):
+    """Decodes a token from encode_cursor, raising ValueError if it is malformed or stale."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        cursor_version, score, position = payload['v'], float(payload['s']), int(payload['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed cursor: {e}")
+    if cursor_version != version:
+        raise ValueError("Cursor belongs to an older snapshot")
+    return score, position